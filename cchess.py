@@ -1,950 +1,3426 @@
-# -*- coding: utf-8 -*-
-# Author: Bo Hu
-# Date: 2024-05-08
-import tkinter as tk
-
-
-class ChineseChessGUI:
-    def __init__(self, root):
-        # Constants for the board size
-        self.BOARD_WIDTH = 9
-        self.BOARD_HEIGHT = 10
-        self.SQUARE_SIZE = 60
-
-        # Define the pieces with their Chinese characters and colors
-        self.PIECES = {
-            'King': {'weight': 5, 'red': '帥', 'black': '將', 'next': [(0, 60), (0, -60), (-60, 0), (60, 0)]},
-            'Chariot': {'weight': 4, 'red': '俥', 'black': '車',
-                        'next': [(x, 0) for x in range(-480, 481, 60)] + [(0, y) for y in range(-540, 541, 60)]},
-            'Horse': {'weight': 3, 'red': '馬', 'black': '馬',
-                      'next': [(-60, -120), (-120, -60), (-120, 60), (-60, 120), (60, 120), (120, 60), (120, -60),
-                               (60, -120)]},
-            'Cannon': {'weight': 3, 'red': '炮', 'black': '砲',
-                       'next': [(x, 0) for x in range(-480, 481, 60)] + [(0, y) for y in range(-540, 541, 60)]},
-            'Pawn': {'weight': 2, 'red': '兵', 'black': '卒', 'next': [(0, 60), (0, -60), (-60, 0), (60, 0)]},
-            'Advisor': {'weight': 4, 'red': '仕', 'black': '士', 'next': [(60, 60), (60, -60), (-60, 60), (-60, -60)]},
-            'Elephant': {'weight': 3, 'red': '相', 'black': '象',
-                         'next': [(120, 120), (120, -120), (-120, 120), (-120, -120)]}
-        }
-        # Initial positions for each piece type (x, y coordinates)
-        self.INITIAL_POSITIONS = {
-            'King': [(4, 0), (4, 9)],
-            'Chariot': [(0, 0), (8, 0), (0, 9), (8, 9)],
-            'Horse': [(1, 0), (7, 0), (1, 9), (7, 9)],
-            'Cannon': [(1, 2), (7, 2), (1, 7), (7, 7)],
-            'Pawn': [(0, 3), (2, 3), (4, 3), (6, 3), (8, 3), (0, 6), (2, 6), (4, 6), (6, 6), (8, 6)],
-            'Advisor': [(3, 0), (5, 0), (3, 9), (5, 9)],
-            'Elephant': [(2, 0), (6, 0), (2, 9), (6, 9)]
-        }
-
-        # Draw the board and frames
-        self.create_frame_1(root)
-        self.canvas = tk.Canvas(root, width=(self.BOARD_WIDTH + 0.5) * self.SQUARE_SIZE,
-                                height=(self.BOARD_HEIGHT + 0.5) * self.SQUARE_SIZE)
-        self.canvas.pack(side='top')
-        self.canvas.bind("<Button-1>", self.player_move_piece)
-        self.create_frame_2(root)
-        self.draw_board()
-
-        # Dictionary to keep track of pieces
-        self.pieces = {}
-        self.board = {}
-
-        # Begin a new game
-        self.new_game()
-
-    def create_frame_1(self, root):
-        """
-        Create the frame above the board canvas
-        :param root: The tk.Window
-        """
-        # Indicate the depth of search tree
-        self.difficulty = tk.IntVar()
-        self.difficulty.set(2)
-
-        # Whether AI moves first
-        self.ai_first = tk.BooleanVar()
-
-        self.frame_1 = tk.Frame(root)
-        self.frame_1.pack(side='top')
-
-        self.label2 = tk.Label(self.frame_1, text='Difficulty:', font=('Arial', 20))
-        self.label2.grid(row=0, column=0)
-
-        self.scale = tk.Scale(self.frame_1, font=('Arial', 15), variable=self.difficulty, orient=tk.HORIZONTAL, from_=1,
-                              to=3)
-        self.scale.grid(row=0, column=1)
-
-        self.check = tk.Checkbutton(self.frame_1, text='AI goes first    ', font=('Arial', 20), variable=self.ai_first,
-                                    command=self.ai_move_first)
-        self.check.grid(row=0, column=2)
-
-        self.button1 = tk.Button(self.frame_1, text="New Game", font=('Arial', 20), fg="blue", command=self.new_game)
-        self.button1.grid(row=0, column=3)
-
-    def ai_move_first(self):
-        """
-        AI make the first move
-        """
-        self.check.config(state='disabled')
-        self.ai_move_piece()
-
-    def new_game(self):
-        """
-        Begin a new game
-        """
-        # Destroy the previous board
-        for piece_id in self.pieces.keys():
-            self.canvas.delete(piece_id)
-
-        # Init the new board
-        self.pieces = {}
-        self.board = {}
-        self.place_pieces()
-
-        # Set the default widget
-        self.check.deselect()
-        self.check.config(state='normal')
-
-        # Get the Kings' ID in current game
-        king_ids = self.get_king_id()
-        self.black_king_id = king_ids['black_king']
-        self.red_king_id = king_ids['red_king']
-
-        # Init the variables
-        self.moves_count = 0
-        self.is_moving = False
-
-        self.label3.config(text="")
-        self.label4.config(text="")
-
-    def create_frame_2(self, root):
-        """
-        Create the frame below board canvas to show some information
-        :param root: The tk.Window
-        """
-        self.frame_2 = tk.Frame(root)
-        self.frame_2.pack(side='top')
-
-        self.label3 = tk.Label(self.frame_2, text='Choose a piece...', font=('Arial', 20))
-        self.label3.grid(row=2, column=0, columnspan=2)
-
-        # This label is to show explanation for invalid move
-        self.label4 = tk.Label(self.frame_2, text='', font=('Arial', 15), fg='red')
-        self.label4.grid(row=3, column=0, columnspan=2)
-
-    def cord(self, coord):
-        """
-        Translate the coordinate in board into canvas
-        :param coord: coordinate in board
-        :return: coordinate in canvas
-        """
-        return (coord + 0.5) * self.SQUARE_SIZE
-
-    def draw_board(self):
-        """
-        Draw the board
-        """
-        for i in range(self.BOARD_WIDTH):
-            self.canvas.create_line(self.cord(i), self.cord(0), self.cord(i), self.cord(self.BOARD_HEIGHT - 1))
-
-        for i in range(self.BOARD_HEIGHT):
-            self.canvas.create_line(self.cord(0), self.cord(i), self.cord(self.BOARD_WIDTH - 1), self.cord(i))
-
-        # Draw the river
-        self.canvas.create_rectangle(self.cord(0), self.cord(4), self.cord(self.BOARD_WIDTH - 1), self.cord(5),
-                                     fill='lightblue')
-
-        # Draw the palaces
-        for x, y in [(3, 0), (3, 7)]:
-            self.canvas.create_line(self.cord(x), self.cord(y), self.cord(x + 2), self.cord(y + 2))
-            self.canvas.create_line(self.cord(x + 2), self.cord(y), self.cord(x), self.cord(y + 2))
-
-        # Draw the notation
-        self.x_notation = "abcdefghi"
-        self.y_notation = "0987654321"
-        for x in range(0, 9):
-            self.canvas.create_text(self.cord(x), self.cord(9.5), text=self.x_notation[x], font=('Arial', 20),
-                                    fill='black')
-        for y in range(0, 10):
-            self.canvas.create_text(self.cord(8.5), self.cord(y), text=self.y_notation[y], font=('Arial', 20),
-                                    fill='black')
-
-    def place_pieces(self):
-        """
-        Place pieces on the canvas
-        """
-        for piece_type, positions in self.INITIAL_POSITIONS.items():
-            for x, y in positions:
-                piece_info = {}
-                color = 'black' if y < self.BOARD_HEIGHT / 2 else 'red'
-                text = self.PIECES[piece_type][color]
-                piece_id = self.canvas.create_text(self.cord(x), self.cord(y), text=text, font=('Arial', 35),
-                                                   fill=color)
-
-                # Store the information of pieces
-                piece_info['type'] = piece_type
-                piece_info['id'] = piece_id
-                piece_info['color'] = color
-                self.board[(x, y)] = piece_info
-                self.pieces[piece_id] = (x, y)
-
-    def player_move_piece(self, event):
-        """
-        Player moves pieces by click the source and then click the target
-        :param event: The mouse click event
-        """
-        # Make sure the game is not over
-        if not self.is_game_over() == 0:
-            self.label3.config(text="Game is over! You can begin a new game!")
-            return
-
-        # Choose the source piece
-        if not self.is_moving:
-            # Get the coordinate on the board
-            self.x1 = round(event.x / self.SQUARE_SIZE - 0.5)
-            self.y1 = round(event.y / self.SQUARE_SIZE - 0.5)
-
-            # Get the item id of current piece
-            self.current_item_id = self.canvas.find_closest(self.cord(self.x1), self.cord(self.y1))[0]
-
-            # Ensure that the player chooses a piece
-            if self.current_item_id in self.pieces.keys():
-                # Make sure player click the piece of the player's side
-                if self.board[(self.x1, self.y1)]['color'] == 'red' and self.ai_first.get():
-                    self.label3.config(text="Oops...AI is red side, you are black side!")
-                    self.label4.config(text="")
-                    return
-                elif self.board[(self.x1, self.y1)]['color'] == 'black' and not self.ai_first.get():
-                    self.label3.config(text="Oops...AI is black side, you are red side!")
-                    self.label4.config(text="")
-                    return
-
-                # Get the source coordinate for further process
-                self.source = (self.cord(self.x1), self.cord(self.y1))
-                self.is_moving = True
-
-                # Show information below the canvas
-                self.label3.config(
-                    text=f"You have chosen the {self.board[self.pieces[self.current_item_id]]['type']} at {self.x_notation[self.x1]}{self.y_notation[self.y1]}.\n Please make a move...")
-                self.label4.config(text='', fg='red', font=('Arial', 15))
-
-        # Choose the target
-        else:
-            # Get the coordinate on the board
-            self.x2 = round(event.x / self.SQUARE_SIZE - 0.5)
-            self.y2 = round(event.y / self.SQUARE_SIZE - 0.5)
-
-            # Translate the coordinate on the board to canvas
-            self.target = (self.cord(self.x2), self.cord(self.y2))
-            target_id = self.canvas.find_closest(self.target[0], self.target[1])[0]
-
-            # Get the change amount of piece's coordinate on canvas
-            dx = self.target[0] - self.source[0]
-            dy = self.target[1] - self.source[1]
-
-            # Ensure piece in chess board
-            if self.x2 > 8 or self.y2 > 9:
-                return
-
-            # Ensure piece can not move to position with piece with same color
-            if target_id in self.pieces.keys() and self.board[self.pieces[target_id]]['color'] == \
-                    self.board[self.pieces[self.current_item_id]]['color']:
-                return
-
-            # Get the type and color of the source piece
-            piece_type = self.board[self.pieces[self.current_item_id]]['type']
-            piece_color = self.board[self.pieces[self.current_item_id]]['color']
-
-            # Make sure whether the movement is valid roughly
-            if (dx, dy) in self.PIECES[self.board[self.pieces[self.current_item_id]]['type']]['next']:
-
-                # Current piece cannot move if it causes two Kings face each other directly
-                if not piece_type == 'King' and self.pieces[self.red_king_id][0] == self.pieces[self.black_king_id][0] == self.x1 and dx:
-                    cnt_block = 0  # Count the pieces between Kings
-                    for x, y in self.board.keys():
-                        if x == self.x1 and self.pieces[self.black_king_id][1] < y < self.pieces[self.red_king_id][1]:
-                            cnt_block += 1
-                    if cnt_block == 1:
-                        self.is_moving = False
-                        self.label3.config(text=f"Oops...This is an invalid move!")
-                        self.label4.config(text=f"Your move for {piece_type} cause your King face the other King directly!")
-                        return
-
-                # Special rules for King and Advisor
-                if piece_type in ('King', 'Advisor'):
-                    # King and Advisor cannot go past its palace
-                    if piece_color == 'red' and 3 <= self.x2 <= 5 and 7 <= self.y2 <= 9:
-                        pass
-                    elif piece_color == 'black' and 3 <= self.x2 <= 5 and 0 <= self.y2 <= 2:
-                        pass
-                    else:
-                        self.is_moving = False
-                        self.label3.config(text=f"Oops...This is an invalid move!")
-                        self.label4.config(text=f"{piece_type} can not go past its 3x3 palace!")
-                        return
-
-                    # King cannot face another King directly
-                    if piece_type == 'King':
-                        king_pass = True
-                        if piece_color == 'red' and self.x2 == self.pieces[self.black_king_id][
-                            0] or piece_color == 'black' and self.x2 == self.pieces[self.red_king_id][0]:
-                            king_pass = False
-                            for other_x, other_y in self.pieces.values():
-                                if other_x == self.x2 and (self.y2 < other_y < self.pieces[self.red_king_id][1] or
-                                                           self.pieces[self.black_king_id][1] < other_y < self.y2):
-                                    king_pass = True
-                                    break
-                        if not king_pass:
-                            self.is_moving = False
-                            self.label3.config(text=f"Oops...This is an invalid move!")
-                            self.label4.config(text=f"{piece_type} can not face the King in other side directly!")
-                            return
-
-                # Special rules for Elephant
-                if piece_type == 'Elephant':
-                    # Elephant can not move if there is a piece on the point in between
-                    if ((self.x1 + self.x2) / 2, (self.y1 + self.y2) / 2) in self.board.keys():
-                        self.is_moving = False
-                        self.label3.config(text=f"Oops...This is an invalid move!")
-                        self.label4.config(
-                            text=f"{piece_type} can not move if there is a piece on the point in between!")
-                        return
-
-                    # Elephant cannot go past the river
-                    if piece_color == 'black' and 0 <= self.y2 <= 4:
-                        pass
-                    elif piece_color == 'red' and 5 <= self.y2 <= 9:
-                        pass
-                    else:
-                        self.is_moving = False
-                        self.label3.config(text=f"Oops...This is an invalid move!")
-                        self.label4.config(text=f"{piece_type} can not go across the river!")
-                        return
-
-                # Special rules for Chariot
-                if piece_type == 'Chariot':
-                    if dy == 0:
-                        if dx > 0:
-                            for x in range(self.x1 + 1, self.x2):
-                                if (x, self.y1) in self.board.keys():
-                                    self.is_moving = False
-                                    self.label3.config(text=f"Oops...This is an invalid move!")
-                                    self.label4.config(text=f"{piece_type} is obstructed!")
-                                    return
-                        else:
-                            for x in range(self.x2 + 1, self.x1):
-                                if (x, self.y1) in self.board.keys():
-                                    self.is_moving = False
-                                    self.label3.config(text=f"Oops...This is an invalid move!")
-                                    self.label4.config(text=f"{piece_type} is obstructed!")
-                                    return
-                    else:
-                        if dy > 0:
-                            for y in range(self.y1 + 1, self.y2):
-                                if (self.x1, y) in self.board.keys():
-                                    self.is_moving = False
-                                    self.label3.config(text=f"Oops...This is an invalid move!")
-                                    self.label4.config(text=f"{piece_type} is obstructed!")
-                                    return
-                        else:
-                            for y in range(self.y2 + 1, self.y1):
-                                if (self.x1, y) in self.board.keys():
-                                    self.is_moving = False
-                                    self.label3.config(text=f"Oops...This is an invalid move!")
-                                    self.label4.config(text=f"{piece_type} is obstructed!")
-                                    return
-
-                # Special rules for Horse
-                if piece_type == 'Horse':
-                    if self.x2 - self.x1 == 1 or self.x2 - self.x1 == -1:
-                        if dy > 0:
-                            if (self.x1, self.y1 + 1) in self.board.keys():
-                                self.is_moving = False
-                                self.label3.config(text=f"Oops...This is an invalid move!")
-                                self.label4.config(
-                                    text=f"{piece_type} can not move if there is a piece on the point in between!")
-                                return
-                        else:
-                            if (self.x1, self.y1 - 1) in self.board.keys():
-                                self.is_moving = False
-                                self.label3.config(text=f"Oops...This is an invalid move!")
-                                self.label4.config(
-                                    text=f"{piece_type} can not move if there is a piece on the point in between!")
-                                return
-                    if self.x2 - self.x1 == 2 or self.x2 - self.x1 == -2:
-                        if dx > 0:
-                            if (self.x1 + 1, self.y1) in self.board.keys():
-                                self.is_moving = False
-                                self.label3.config(text=f"Oops...This is an invalid move!")
-                                self.label4.config(
-                                    text=f"{piece_type} can not move if there is a piece on the point in between!")
-                                return
-                        else:
-                            if (self.x1 - 1, self.y1) in self.board.keys():
-                                self.is_moving = False
-                                self.label3.config(text=f"Oops...This is an invalid move!")
-                                self.label4.config(
-                                    text=f"{piece_type} can not move if there is a piece on the point in between!")
-                                return
-
-                # Special rules for Cannon
-                if piece_type == 'Cannon':
-                    count = 0
-                    if dy == 0:
-                        if dx > 0:
-                            for x in range(self.x1 + 1, self.x2):
-                                if (x, self.y1) in self.board.keys():
-                                    count += 1
-                        else:
-                            for x in range(self.x2 + 1, self.x1):
-                                if (x, self.y1) in self.board.keys():
-                                    count += 1
-
-                    else:
-                        if dy > 0:
-                            for y in range(self.y1 + 1, self.y2):
-                                if (self.x1, y) in self.board.keys():
-                                    count += 1
-
-                        else:
-                            for y in range(self.y2 + 1, self.y1):
-                                if (self.x1, y) in self.board.keys():
-                                    count += 1
-
-                    if count == 0 and not (self.x2, self.y2) in self.board.keys():
-                        pass
-                    elif count == 1 and (self.x2, self.y2) in self.board.keys():
-                        pass
-                    elif count == 0 and (self.x2, self.y2) in self.board.keys():
-                        self.is_moving = False
-                        self.label3.config(text=f"Oops...This is an invalid move!")
-                        self.label4.config(text=f"{piece_type} needs one intermittent piece!")
-                        return
-                    else:
-                        self.is_moving = False
-                        self.label3.config(text=f"Oops...This is an invalid move!")
-                        self.label4.config(text=f"{piece_type} is obstructed!")
-                        return
-
-                # Special rules for Pawn
-                if piece_type == 'Pawn':
-                    if piece_color == 'red':
-                        if dy > 0 or self.y1 >= 5 and dx != 0:
-                            self.is_moving = False
-                            self.label3.config(text=f"Oops...This is an invalid move!")
-                            if dy > 0:
-                                self.label4.config(text=f"{piece_type} can only move forward!")
-                            else:
-                                self.label4.config(
-                                    text=f"{piece_type} can only move sideways after it goes across the river!")
-                            return
-                    else:
-                        if dy < 0 or self.y1 <= 4 and dx != 0:
-                            self.is_moving = False
-                            self.label3.config(text=f"Oops...This is an invalid move!")
-                            if dy < 0:
-                                self.label4.config(text=f"{piece_type} can only move forward!")
-                            else:
-                                self.label4.config(
-                                    text=f"{piece_type} can only move sideways after it goes across the river!")
-                            return
-
-                # Check for capture
-                capture = False
-                if target_id in self.pieces.keys() and self.board[self.pieces[target_id]]['color'] != \
-                        self.board[self.pieces[self.current_item_id]]['color']:
-                    # Remove captured piece
-                    self.label3.config(text=f"You capture opponent’s {self.board[self.pieces[target_id]]['type']}!")
-                    self.canvas.delete(target_id)
-                    del self.board[(self.x2, self.y2)]
-                    del self.pieces[target_id]
-                    capture = True
-
-                # Move the piece
-                if (self.x2, self.y2) not in self.board or self.board[(self.x2, self.y2)]['color'] != \
-                        self.board[self.pieces[self.current_item_id]]['color']:
-
-                    # Move the piece on canvas
-                    self.canvas.move(self.current_item_id, dx, dy)
-                    self.moves_count += 1
-                    self.check.config(state='disabled')
-
-                    # Update the pieces and board
-                    self.board[(self.x2, self.y2)] = self.board[self.pieces[self.current_item_id]]
-                    del self.board[self.pieces[self.current_item_id]]
-                    self.pieces[self.current_item_id] = (self.x2, self.y2)
-
-                    # AI make a move if game is not over
-                    if self.is_game_over() == 0:
-                        self.ai_move_piece()
-                    elif self.is_game_over() == 1:
-                        self.label4.config(text=f"You Win!!!", fg='green', font=('Arial', 20))
-                    elif self.is_game_over() == 3:
-                        self.label4.config(text="Draw", fg='green', font=('Arial', 20))
-
-                    if not capture:
-                        self.label3.config(
-                            text=f"Valid move {self.x_notation[self.x1]}{self.y_notation[self.y1]}{self.x_notation[self.x2]}{self.y_notation[self.y2]}")
-                else:
-                    self.label3.config(text=f"Oops...This is an invalid move!")
-
-            # Some warning if player makes invalid operation
-            else:
-                self.label3.config(text=f"Oops...This is an invalid move!")
-
-                # Errors for corresponding pieces
-                if piece_type == 'King':
-                    self.label4.config(text="King can only move one block vertically or horizontally!")
-                if piece_type == 'Chariot':
-                    self.label4.config(text="Chariot can only move vertically or horizontally!")
-                if piece_type == 'Horse':
-                    self.label4.config(
-                        text="Horse can only move to the opposite corner of a rectangle formed by 1x2 blocks!")
-                if piece_type == 'Cannon':
-                    self.label4.config(text="Cannon can only move vertically or horizontally!")
-                if piece_type == 'Pawn':
-                    self.label4.config(text="Pawn can only move one block vertically or horizontally!")
-                if piece_type == 'Advisor':
-                    self.label4.config(text="Advisor can only move diagonally by a block!")
-                if piece_type == 'Elephant':
-                    self.label4.config(
-                        text="Elephant can only move to the opposite corner of a square formed by 2x2 blocks!")
-
-            # Change the flag for next movement
-            self.is_moving = False
-
-    def ai_move_piece(self):
-        """
-        AI moves a piece
-        """
-        # AI begin evaluation to get the best move
-        self.start_evaluation()
-
-        # Get the source and target information of the best move
-        best_value = max(self.successor_eval.keys())
-        source_id, dx, dy = self.successor_eval[best_value]
-        source_x, source_y = self.pieces[source_id]
-        target_x, target_y = source_x + dx, source_y + dy
-
-        # AI capture player's pieces
-        if (target_x, target_y) in self.board.keys():
-            target_id = self.board[(target_x, target_y)]['id']
-            del self.board[(target_x, target_y)]
-            del self.pieces[target_id]
-            self.canvas.delete(target_id)
-
-        # AI make move
-        self.board[(target_x, target_y)] = self.board[(source_x, source_y)]
-        self.pieces[source_id] = (target_x, target_y)
-        del self.board[(source_x, source_y)]
-        self.canvas.move(source_id, dx * 60, dy * 60)
-        self.moves_count += 1
-        self.label4.config(
-            text=f"AI makes move {self.x_notation[source_x]}{self.y_notation[source_y]}{self.x_notation[target_x]}{self.y_notation[target_y]}",
-            fg='blue', font=('Arial', 20))
-
-        # Check whether game is over
-        if self.is_game_over() == 3:
-            self.label4.config(text="Draw", fg='green', font=('Arial', 20))
-        elif self.is_game_over() == 2:
-            self.label4.config(text="You Lose...", fg='green', font=('Arial', 20))
-
-    def is_game_over(self):
-        """
-        Check whether game is over
-        :return: An int value representing the state of game
-        """
-        # AI wins
-        if self.red_king_id not in self.pieces.keys() and self.ai_first.get() or self.black_king_id not in self.pieces.keys() and not self.ai_first.get():
-            res = 1
-        # Player wins
-        elif self.black_king_id not in self.pieces.keys() and self.ai_first.get() or self.red_king_id not in self.pieces.keys() and not self.ai_first.get():
-            res = 2
-        # Draw
-        elif self.moves_count == 50:
-            res = 3
-        # Game is not over
-        else:
-            res = 0
-        return res
-
-    def get_king_id(self):
-        """
-        Get the ID of both King for easy further process
-        :return: A dict consists of id of King
-        """
-        res = {}
-        for info in self.board.values():
-            if info['type'] == 'King':
-                if info['color'] == 'red':
-                    res['red_king'] = info['id']
-                else:
-                    res['black_king'] = info['id']
-        return res
-
-    def static_evaluation(self):
-        """
-        Evaluate the current board and return a score
-        Higher the score means that the AI's side has more advantage on current board
-        :return: The static score value of the current chess board
-        """
-        # King is captured
-        if self.black_king_id not in self.pieces.keys():
-            if self.ai_first.get():
-                return float("inf")
-            else:
-                return -float("inf")
-        if self.red_king_id not in self.pieces.keys():
-            if self.ai_first.get():
-                return -float("inf")
-            else:
-                return float("inf")
-
-        evaluation = 0  # The greater the value, the better for the red side       
-        attack_strength = 0  # A measure of the distribution of attacking pieces
-        num_advantage = 0  # A weighted measure of the advantage of the number of pieces
-
-        # Go through the pieces on board to calculate the static evaluation
-        for (x, y), info in self.board.items():
-            # Calculate advantage of nums
-            if info['color'] == 'red':
-                if self.ai_first.get():
-                    num_advantage += self.PIECES[info['type']]['weight'] * 8
-                else:
-                    num_advantage -= self.PIECES[info['type']]['weight'] * 8
-
-            else:
-                if self.ai_first.get():
-                    num_advantage -= self.PIECES[info['type']]['weight'] * 8
-                else:
-                    num_advantage += self.PIECES[info['type']]['weight'] * 8
-
-            # Calculate attack strength
-            if info['type'] in ('Chariot', 'Horse', 'Cannon', 'Pawn'):
-                if info['color'] == 'red':
-                    if self.ai_first.get():
-                        attack_strength += (9 - y) * self.PIECES[info['type']]['weight']
-                    else:
-                        attack_strength -= (9 - y) * self.PIECES[info['type']]['weight']
-
-                else:
-                    if self.ai_first.get():
-                        attack_strength -= y * self.PIECES[info['type']]['weight']
-                    else:
-                        attack_strength += y * self.PIECES[info['type']]['weight']
-
-        # Calculate the combination of two metrics
-        evaluation += num_advantage + attack_strength
-        return evaluation
-
-    def start_evaluation(self):
-        """
-        Start the evaluation for AI to make a decision
-        """
-        self.successor_eval = {}
-        self.depth_limit = self.difficulty.get()
-
-        # Call the minimax algorithm to evaluate
-        self.minimax(None, 0, -float("inf"), float("inf"))
-
-    def occupy(self, action):
-        """
-        Make the occupy on the board to mark the movement of piece
-        :param action: A tuple indicate a movement
-        :return: A dict consist of the information of occupy
-        """
-        if not action:
-            return None
-
-        # Get the information of current action
-        source_id, dx, dy = action
-        x, y = self.pieces[source_id]
-        occupy_info = {'source_info': (x, y, self.board[(x, y)])}
-
-        # Make a capture
-        if (x + dx, y + dy) in self.board.keys():
-            eaten_id = self.board[(x + dx, y + dy)]['id']
-            occupy_info['eaten_info'] = (x + dx, y + dy, self.board[(x + dx, y + dy)])
-            del self.pieces[eaten_id]
-
-        # Move the piece
-        self.board[(x + dx, y + dy)] = self.board[(x, y)]
-        del self.board[(x, y)]
-        self.pieces[source_id] = (x + dx, y + dy)
-
-        return occupy_info
-
-    def restore(self, occupy_info):
-        """
-        Restore the board after occupying.
-        :param occupy_info: A dict consist of the information produced by occupy
-        """
-        if not occupy_info:
-            return
-
-        # Get the information of changes on board
-        source_x, source_y, source_info = occupy_info['source_info']
-
-        # Occupy doesn't make a capture
-        if len(occupy_info) == 1:
-            # Restore the piece to its original place
-            self.board[(source_x, source_y)] = source_info
-            del self.board[self.pieces[source_info['id']]]
-            self.pieces[source_info['id']] = (source_x, source_y)
-
-        # Occupy make a capture
-        else:
-            # Restore the piece to its original place
-            eaten_x, eaten_y, eaten_info = occupy_info['eaten_info']
-            self.board[(source_x, source_y)] = source_info
-            del self.board[self.pieces[source_info['id']]]
-            self.pieces[source_info['id']] = (source_x, source_y)
-
-            # Restore the piece which has been eaten
-            self.board[(eaten_x, eaten_y)] = eaten_info
-            self.pieces[eaten_info['id']] = (eaten_x, eaten_y)
-
-    def minimax(self, action, depth, alpha, beta):
-        """
-        The algorithm implements the minimax evaluation
-        :param action: The valid movement of piece to be evaluated
-        :param depth: The current depth of minimax search tree
-        :param alpha: The evaluation value in AI side
-        :param beta: The evaluation value in player side
-        :return: The static evaluation at leaf nodes or the static evaluation when game over
-        """
-        # Whether the current layer is for maximizing player
-        is_maximizing_player = True if depth % 2 == 0 else False
-
-        # Store the information of occupy for later restore
-        occupy_info = self.occupy(action=action)
-
-        # If reach the depth limit or game over
-        best_value = self.static_evaluation()
-        if depth >= self.depth_limit or best_value in (float("inf"), -float("inf")):
-            pass
-
-        # For AI side
-        elif is_maximizing_player:
-            best_value = -float("inf")
-            next_actions = self.valid_next_actions(is_maximizing_player)
-
-            # Go through all potential actions
-            for next_action in next_actions:
-                value = self.minimax(next_action, depth + 1, alpha, beta)
-
-                # Record the value at root node
-                if depth == 0:
-                    self.successor_eval[value] = next_action
-
-                # Choose the larger one
-                best_value = max(best_value, value)
-                alpha = max(alpha, best_value)
-                if alpha > beta:
-                    break
-
-        # For player side
-        elif not is_maximizing_player:
-            next_actions = self.valid_next_actions(is_maximizing_player)
-            best_value = float("inf")
-
-            # Go through all potential actions
-            for next_action in next_actions:
-                value = self.minimax(next_action, depth + 1, alpha, beta)
-
-                # Choose the smaller one
-                best_value = min(best_value, value)
-                beta = min(beta, best_value)
-                if beta < alpha:
-                    break
-
-        # Restore the board
-        self.restore(occupy_info)
-
-        return best_value
-
-    def valid_next_actions(self, is_maximizing_player):
-        """
-        This method is to get all the valid actions for one side to move each pieces in its side.
-        :param is_maximizing_player: Indicate whether now is AI or player to move.
-        :return: A list of tuple (source_id, dx, dy) represents valid next actions for one side
-        """
-        valid_next_actions = []  # Init the list of final actions
-
-        # Go through all pieces in board
-        for (x, y), info in self.board.items():
-            # Get the color and type of the current piece
-            piece_type = info['type']
-            piece_color = info['color']
-
-            # Make sure the piece belongs to the right side
-            if ((
-                    piece_color == 'red' and is_maximizing_player or piece_color == 'black' and not is_maximizing_player) and self.ai_first.get()
-                    or (
-                            piece_color == 'red' and not is_maximizing_player or piece_color == 'black' and is_maximizing_player) and not self.ai_first.get()):
-
-                # Go through all potential movements of the current piece
-                for dx, dy in self.PIECES[piece_type]['next']:
-                    # Translate the coordinate on canvas to board
-                    dx, dy = int(dx // 60), int(dy // 60)
-                    # Init the flag indicating whether the movement is valid
-                    is_valid = True
-
-                    # Ensure piece in chess board
-                    if not 0 <= x + dx <= 8 or not 0 <= y + dy <= 9:
-                        continue
-
-                    # Make sure current movement will not cause two Kings face each other directly
-                    if not piece_type == 'King' and self.pieces[self.black_king_id][0] == self.pieces[self.red_king_id][0] == x and dx:
-                        cnt_block = 0  # Count the pieces between two Kings
-
-                        # Go through the pieces on board to check whether the current piece is the only one between two Kings
-                        for other_x, other_y in self.board.keys():
-                            if other_x == x and self.pieces[self.black_king_id][1] < other_y < self.pieces[self.red_king_id][1]:
-                                cnt_block += 1
-                        if cnt_block == 1:
-                            continue
-
-                    # Ensure piece can not move to position with piece with same color
-                    if (x + dx, y + dy) in self.board.keys() and piece_color == self.board[(x + dx, y + dy)]['color']:
-                        continue
-
-                    # Special rules for King and Advisor
-                    if piece_type in ('King', 'Advisor'):
-
-                        # King and Advisor cannot go pass its 3x3 palace
-                        if piece_color == 'red' and 3 <= x + dx <= 5 and 7 <= y + dy <= 9:
-                            pass
-                        elif piece_color == 'black' and 3 <= x + dx <= 5 and 0 <= y + dy <= 2:
-                            pass
-                        else:
-                            is_valid = False
-
-                        # King's movement cannot cause itself face the other King directly
-                        if piece_type == 'King':
-                            if piece_color == 'red' and x + dx == self.pieces[self.black_king_id][
-                                0] or piece_color == 'black' and x + dx == self.pieces[self.red_king_id][0]:
-                                is_valid = False
-                                for other_x, other_y in self.pieces.values():
-                                    if other_x == x + dx and (y + dy < other_y < self.pieces[self.red_king_id][1] or
-                                                              self.pieces[self.red_king_id][1] < other_y < y + dy):
-                                        is_valid = True
-                                        break
-
-                    # Special rules for Elephant
-                    if piece_type == 'Elephant':
-                        # Elephant cannot move if there is a block
-                        if (x + dx / 2, y + dy / 2) in self.board.keys():
-                            is_valid = False
-
-                        # Elephant cannot go pass the river
-                        if piece_color == 'black' and 0 <= y + dy <= 4:
-                            pass
-                        elif piece_color == 'red' and 5 <= y + dy <= 9:
-                            pass
-                        else:
-                            is_valid = False
-
-                    # Special rules for Chariot
-                    if piece_type == 'Chariot':
-                        if dy == 0:
-                            if dx > 0:
-                                for i in range(x + 1, x + dx):
-                                    if (i, y) in self.board.keys():
-                                        is_valid = False
-                                        break
-                            else:
-                                for i in range(x + dx + 1, x):
-                                    if (i, y) in self.board.keys():
-                                        is_valid = False
-                                        break
-                        else:
-                            if dy > 0:
-                                for i in range(y + 1, y + dy):
-                                    if (x, i) in self.board.keys():
-                                        is_valid = False
-                                        break
-                            else:
-                                for i in range(y + dy + 1, y):
-                                    if (x, i) in self.board.keys():
-                                        is_valid = False
-                                        break
-
-                    # Special rules for Horse
-                    if piece_type == 'Horse':
-                        # Horse cannot move if blocked
-                        if dx == 1 or dx == -1:
-                            if dy > 0:
-                                if (x, y + 1) in self.board.keys():
-                                    is_valid = False
-                            else:
-                                if (x, y - 1) in self.board.keys():
-                                    is_valid = False
-
-                        if dx == 2 or dx == -2:
-                            if dx > 0:
-                                if (x + 1, y) in self.board.keys():
-                                    is_valid = False
-                            else:
-                                if (x - 1, y) in self.board.keys():
-                                    is_valid = False
-
-                    # Special rules for Cannon
-                    if piece_type == 'Cannon':
-                        count = 0
-                        if dy == 0:
-                            if dx > 0:
-                                for i in range(x + 1, x + dx):
-                                    if (i, y) in self.board.keys():
-                                        count += 1
-                            else:
-                                for i in range(x + dx + 1, x):
-                                    if (i, y) in self.board.keys():
-                                        count += 1
-
-                        else:
-                            if dy > 0:
-                                for i in range(y + 1, y + dy):
-                                    if (x, i) in self.board.keys():
-                                        count += 1
-
-                            else:
-                                for i in range(y + dy + 1, y):
-                                    if (x, i) in self.board.keys():
-                                        count += 1
-
-                        if count == 0 and not (x + dx, y + dy) in self.board.keys():
-                            pass
-                        elif count == 1 and (x + dx, y + dy) in self.board.keys():
-                            pass
-                        else:
-                            is_valid = False
-
-                    # Special rules for Pawn
-                    if piece_type == 'Pawn':
-                        if piece_color == 'red':
-                            if dy > 0 or y >= 5 and dx != 0:
-                                is_valid = False
-                        else:
-                            if dy < 0 or y <= 4 and dx != 0:
-                                is_valid = False
-
-                    if is_valid:
-                        valid_next_actions.append((info['id'], dx, dy))
-
-        return valid_next_actions
-
-
-def main():
-    # Create the main window
-    root = tk.Tk()
-    root.title("Chinese Chess")
-    root.geometry('800x800')
-    root.resizable(False, False)
-    my_game = ChineseChessGUI(root)
-    root.mainloop()
-
-
-if __name__ == "__main__":
-    main()
+# -*- coding: utf-8 -*-
+# Author: Bo Hu
+# Date: 2024-05-08
+import argparse
+import itertools
+import json
+import math
+import mmap
+import multiprocessing
+import os
+import queue
+import random
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Constants for the board size
+BOARD_WIDTH = 9
+BOARD_HEIGHT = 10
+
+# Define the pieces with their Chinese characters and colors
+PIECES = {
+    'King': {'weight': 5, 'red': '帥', 'black': '將', 'next': [(0, 60), (0, -60), (-60, 0), (60, 0)]},
+    'Chariot': {'weight': 4, 'red': '俥', 'black': '車',
+                'next': [(x, 0) for x in range(-480, 481, 60)] + [(0, y) for y in range(-540, 541, 60)]},
+    'Horse': {'weight': 3, 'red': '馬', 'black': '馬',
+              'next': [(-60, -120), (-120, -60), (-120, 60), (-60, 120), (60, 120), (120, 60), (120, -60),
+                       (60, -120)]},
+    'Cannon': {'weight': 3, 'red': '炮', 'black': '砲',
+               'next': [(x, 0) for x in range(-480, 481, 60)] + [(0, y) for y in range(-540, 541, 60)]},
+    'Pawn': {'weight': 2, 'red': '兵', 'black': '卒', 'next': [(0, 60), (0, -60), (-60, 0), (60, 0)]},
+    'Advisor': {'weight': 4, 'red': '仕', 'black': '士', 'next': [(60, 60), (60, -60), (-60, 60), (-60, -60)]},
+    'Elephant': {'weight': 3, 'red': '相', 'black': '象',
+                 'next': [(120, 120), (120, -120), (-120, 120), (-120, -120)]}
+}
+
+# Initial positions for each piece type (x, y coordinates)
+INITIAL_POSITIONS = {
+    'King': [(4, 0), (4, 9)],
+    'Chariot': [(0, 0), (8, 0), (0, 9), (8, 9)],
+    'Horse': [(1, 0), (7, 0), (1, 9), (7, 9)],
+    'Cannon': [(1, 2), (7, 2), (1, 7), (7, 7)],
+    'Pawn': [(0, 3), (2, 3), (4, 3), (6, 3), (8, 3), (0, 6), (2, 6), (4, 6), (6, 6), (8, 6)],
+    'Advisor': [(3, 0), (5, 0), (3, 9), (5, 9)],
+    'Elephant': [(2, 0), (6, 0), (2, 9), (6, 9)]
+}
+
+# Small int codes of the piece types, a piece on the board is the code of its type plus the code of its color
+KING, ADVISOR, ELEPHANT, HORSE, CHARIOT, CANNON, PAWN = range(1, 8)
+RED, BLACK = 8, 16
+PIECE_CODES = {'King': KING, 'Advisor': ADVISOR, 'Elephant': ELEPHANT, 'Horse': HORSE, 'Chariot': CHARIOT,
+               'Cannon': CANNON, 'Pawn': PAWN}
+PIECE_NAMES = {code: name for name, code in PIECE_CODES.items()}
+COLOR_CODES = {'red': RED, 'black': BLACK}
+COLOR_NAMES = {RED: 'red', BLACK: 'black'}
+
+# The letters of the piece types in FEN, red pieces are upper case, E and H are accepted for Elephant and Horse too
+FEN_LETTERS = {KING: 'k', ADVISOR: 'a', ELEPHANT: 'b', HORSE: 'n', CHARIOT: 'r', CANNON: 'c', PAWN: 'p'}
+FEN_CODES = dict({letter: code for code, letter in FEN_LETTERS.items()}, e=ELEPHANT, h=HORSE)
+INITIAL_FEN = 'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1'
+
+# An action is packed into an int, the source square in the lowest 7 bits, the target square in the next 7 bits and the
+# code of the piece captured on the target square above them. These bits hold both squares
+ACTION_SQUARES = (1 << 14) - 1
+
+# The weight of every piece type, indexed by its code
+PIECE_WEIGHTS = [0] + [PIECES[PIECE_NAMES[code]]['weight'] for code in range(KING, PAWN + 1)]
+
+# Random 64-bit keys of every piece on every square, which are XORed together into the key of a position
+_zobrist_random = random.Random(20240508)
+ZOBRIST_KEYS = [[_zobrist_random.getrandbits(64) for _ in range(BOARD_WIDTH * BOARD_HEIGHT)] for _ in range(24)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+
+
+def _piece_square_value(piece, sq):
+    """
+    The static value of a piece on a square for the red side
+    :param piece: The code of the piece
+    :param sq: The square of the piece
+    :return: The weighted piece count plus the attack strength of the piece
+    """
+    piece_type, color = piece & 7, piece & 24
+    weight = PIECES[PIECE_NAMES[piece_type]]['weight']
+    y = sq // BOARD_WIDTH
+    value = weight * 8
+
+    # A measure of the distribution of attacking pieces
+    if piece_type in (CHARIOT, HORSE, CANNON, PAWN):
+        value += (9 - y) * weight if color == RED else y * weight
+    return value if color == RED else -value
+
+
+# The static value of every piece on every square
+PIECE_SQUARE_VALUES = [[_piece_square_value(piece, sq) if piece & 7 and piece & 24 else 0
+                        for sq in range(BOARD_WIDTH * BOARD_HEIGHT)] for piece in range(24)]
+
+
+def pack_action(source, target, eaten=0):
+    """
+    Pack an action into an int, see ACTION_SQUARES
+    :param source: The square the piece moves from
+    :param target: The square the piece moves to
+    :param eaten: The code of the piece captured on the target square or 0
+    :return: The action
+    """
+    return source | target << 7 | eaten << 14
+
+
+def _capture_order(board, action):
+    """
+    Order a capture by most valuable victim, least valuable attacker
+    :param board: The board the capture is made on
+    :param action: The capture
+    :return: The key, higher for the captures to search first
+    """
+    return PIECE_WEIGHTS[action >> 14 & 7] * 16 - PIECE_WEIGHTS[board[action & 127] & 7]
+
+
+def _square(x, y):
+    """
+    Get the square of a point, or None if the point is outside the board
+    """
+    if 0 <= x < BOARD_WIDTH and 0 <= y < BOARD_HEIGHT:
+        return y * BOARD_WIDTH + x
+    return None
+
+
+def _in_palace(color, x, y):
+    """
+    Check whether a point is inside the 3x3 palace of one side
+    """
+    return 3 <= x <= 5 and (7 <= y <= 9 if color == RED else 0 <= y <= 2)
+
+
+def _build_move_tables():
+    """
+    Build the tables of the squares every piece can reach from every square, which are built once at import
+    Sliding pieces get the rays of squares in four directions, and Horse and Elephant get the square which blocks
+    each movement
+    :return: A dict of the tables
+    """
+    squares = range(BOARD_WIDTH * BOARD_HEIGHT)
+    tables = {'rays': [], 'horse': [], 'king': {RED: [], BLACK: []}, 'advisor': {RED: [], BLACK: []},
+              'elephant': {RED: [], BLACK: []}, 'pawn': {RED: [], BLACK: []}}
+    for sq in squares:
+        y, x = divmod(sq, BOARD_WIDTH)
+        tables['rays'].append(
+            [[_square(x + dx * i, y + dy * i) for i in range(1, BOARD_HEIGHT) if _square(x + dx * i, y + dy * i)
+              is not None] for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0))])
+
+        # Horse cannot move if its leg is blocked
+        tables['horse'].append(
+            [(_square(x + dx, y + dy), _square(x + leg_x, y + leg_y))
+             for dx, dy, leg_x, leg_y in ((1, 2, 0, 1), (-1, 2, 0, 1), (1, -2, 0, -1), (-1, -2, 0, -1),
+                                          (2, 1, 1, 0), (2, -1, 1, 0), (-2, 1, -1, 0), (-2, -1, -1, 0))
+             if _square(x + dx, y + dy) is not None])
+
+        for color in (RED, BLACK):
+            # King and Advisor cannot go pass its 3x3 palace
+            tables['king'][color].append([_square(x + dx, y + dy) for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0))
+                                          if _in_palace(color, x + dx, y + dy)])
+            tables['advisor'][color].append([_square(x + dx, y + dy)
+                                             for dx, dy in ((1, 1), (1, -1), (-1, 1), (-1, -1))
+                                             if _in_palace(color, x + dx, y + dy)])
+
+            # Elephant cannot go pass the river or move if there is a piece on its eye
+            tables['elephant'][color].append(
+                [(_square(x + dx, y + dy), _square(x + dx // 2, y + dy // 2))
+                 for dx, dy in ((2, 2), (2, -2), (-2, 2), (-2, -2))
+                 if _square(x + dx, y + dy) is not None and (y + dy >= 5 if color == RED else y + dy <= 4)])
+
+            # Pawn can only move sideways after it goes across the river
+            forward = -1 if color == RED else 1
+            steps = [(0, forward)]
+            if y <= 4 if color == RED else y >= 5:
+                steps += [(1, 0), (-1, 0)]
+            tables['pawn'][color].append([_square(x + dx, y + dy) for dx, dy in steps
+                                          if _square(x + dx, y + dy) is not None])
+
+    # The squares from which a Horse or a Pawn attacks every square
+    tables['horse_attacks'] = [[] for _ in squares]
+    tables['pawn_attacks'] = {RED: [[] for _ in squares], BLACK: [[] for _ in squares]}
+    for sq in squares:
+        for target, leg in tables['horse'][sq]:
+            tables['horse_attacks'][target].append((sq, leg))
+        for color in (RED, BLACK):
+            for target in tables['pawn'][color][sq]:
+                tables['pawn_attacks'][color][target].append(sq)
+    return tables
+
+
+_move_tables = _build_move_tables()
+RAYS = _move_tables['rays']
+HORSE_MOVES = _move_tables['horse']
+KING_MOVES = _move_tables['king']
+ADVISOR_MOVES = _move_tables['advisor']
+ELEPHANT_MOVES = _move_tables['elephant']
+PAWN_MOVES = _move_tables['pawn']
+HORSE_ATTACKS = _move_tables['horse_attacks']
+PAWN_ATTACKS = _move_tables['pawn_attacks']
+
+# Positions given by FEN, with the number of leaf nodes at each depth
+# The counts of the first four positions are published ones, which other move generators agree on
+PERFT_SUITE = [
+    (INITIAL_FEN, {1: 44, 2: 1920, 3: 79666, 4: 3290240}),
+    ('r1ba1a3/4kn3/2n1b4/pNp1p1p1p/4c4/6P2/P1P2R2P/1CcC5/9/2BAKAB2 w - - 0 1', {1: 38, 2: 1128, 3: 43929}),
+    ('1cbak4/9/n2a5/2p1p3p/5cp2/2n2N3/6PCP/3AB4/2C6/3A1K1N1 w - - 0 1', {1: 7, 2: 281, 3: 8620}),
+    ('5a3/3k5/3aR4/9/5r3/5n3/9/3A1A3/5K3/2BC2B2 w - - 0 1', {1: 25, 2: 424, 3: 9850}),
+    # A regression baseline only, the side to move is in check and the counts were recorded from this generator
+    ('2bakn1C1/4a4/b8/9/1r2p4/P1B3r2/4P3P/3A5/7R1/3K1A3 b - - 0 1', {1: 4, 2: 135, 3: 4384}),
+]
+
+# Positions given by FEN, with the plies of their shortest forced win, which a deep enough search has to find
+MATE_SUITE = [
+    ('4k4/9/5a3/6R2/9/9/9/9/3K5/9 w - - 0 1', 5),
+    ('9/3ka4/9/9/9/9/9/6R2/9/4K4 w - - 0 1', 3),
+]
+
+# The opening book file starts with the magic bytes and the key of the initial position, which changes whenever
+# the Zobrist keys change, then the records (key, action, weight) follow sorted by key
+BOOK_MAGIC = b'CCBOOK1\0'
+BOOK_HEADER = struct.Struct('>8sQ')
+BOOK_RECORD = struct.Struct('>QHH')
+
+# A tablebase file starts with the magic bytes, then holds one byte for every placement of its pieces
+TABLEBASE_MAGIC = b'CCTB1\0\0\0'
+
+# The score of a mate, less the plies to the end of the game so that faster wins and slower losses score higher
+MATE_SCORE = 10000
+
+# Scores beyond this bound are mates or wins found in the tablebase, whose distance is relative to the root
+MATE_BOUND = MATE_SCORE - 1000
+
+# Bound types of the scores in transposition table
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+# The deepest iteration of a search with a time limit
+MAX_DEPTH = 64
+
+# The deepest ply of the search tree, which is deeper than MAX_DEPTH because of check extensions
+MAX_PLY = 2 * MAX_DEPTH
+
+# Priorities of the actions in move ordering, the history scores stay below killer moves
+TABLE_ACTION_PRIORITY = 1 << 42
+CAPTURE_PRIORITY = 1 << 41
+KILLER_PRIORITY = 1 << 40
+
+# A capture in quiescence search is skipped if winning the captured piece plus this margin can not raise alpha
+DELTA_MARGIN = 40
+
+# The deepest search the difficulty of the GUI offers, which takes about a second in a middle game
+MAX_DIFFICULTY = 6
+
+# A pass is searched this much shallower in null-move pruning, one more when at least six plies remain
+NULL_MOVE_REDUCTION = 2
+
+# Quiet actions after the first few ones are searched a ply shallower, two plies when they come very late
+LATE_MOVE_INDEX = 3
+VERY_LATE_MOVE_INDEX = 12
+
+# The half width of the first window around the value of the previous iteration, it is widened four times each time
+# the value falls outside
+ASPIRATION_WINDOW = 16
+
+
+class Position:
+    """
+    The state of a game which can be searched without any display
+    The board is a bytearray of 90 squares, the square of (x, y) is y * 9 + x and holds the code of its piece or 0
+    """
+
+    def __init__(self):
+        self.board = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+
+        # The side to move
+        self.side = RED
+
+        # The squares of both Kings, None if the King has been captured
+        self.kings = {RED: None, BLACK: None}
+
+        # The Zobrist key of the position
+        self.key = 0
+
+        # The running total of the static values of all pieces, the greater the value, the better for the red side
+        self.evaluation = 0
+
+        self.clear_history()
+
+    def clear_history(self):
+        """
+        Forget the actions made so far, which is done whenever the pieces are set up
+        """
+        # A tuple (key, previous, occupy_info) for every action made in the game and the search, where key is the key
+        # of the position before the action and previous is the index of the same key earlier in the history or -1
+        self.history = []
+
+        # The index of the latest occurrence of every key in the history, so that a repetition is found at once
+        self.key_index = {}
+
+        # The lengths of the history when a side passed, no repetition is looked for across a pass
+        self.null_plies = []
+
+    def place_pieces(self):
+        """
+        Place pieces in their initial positions
+        """
+        self.board = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+        self.side = RED
+        for piece_type, positions in INITIAL_POSITIONS.items():
+            for x, y in positions:
+                color = BLACK if y < BOARD_HEIGHT / 2 else RED
+                self.board[y * BOARD_WIDTH + x] = PIECE_CODES[piece_type] | color
+                if piece_type == 'King':
+                    self.kings[color] = y * BOARD_WIDTH + x
+
+        self.key = self.compute_key()
+        self.evaluation = self.compute_evaluation()
+        self.clear_history()
+
+    def load_fen(self, fen):
+        """
+        Set up the position described by a FEN string, the ranks are listed from the black side
+        Each side needs exactly one King inside its palace, since the search can not handle a position without one,
+        and the side not to move must not be in check
+        :param fen: e.g. INITIAL_FEN, the fields after the side to move are ignored
+        """
+        fields = fen.split()
+        ranks = fields[0].split('/') if fields else []
+        if len(ranks) != BOARD_HEIGHT:
+            raise ValueError(f"Invalid FEN {fen!r}: expected {BOARD_HEIGHT} ranks")
+
+        board = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+        kings = {RED: None, BLACK: None}
+        for y, rank in enumerate(ranks):
+            x = 0
+            empty = False
+            for letter in rank:
+                # A run of empty squares is a single digit from 1 to 9
+                if letter.isdigit():
+                    if empty or letter == '0':
+                        raise ValueError(f"Invalid FEN {fen!r}: bad rank {rank!r}")
+                    x += int(letter)
+                    empty = True
+                    continue
+                empty = False
+                code = FEN_CODES.get(letter.lower())
+                if code is None or x >= BOARD_WIDTH:
+                    raise ValueError(f"Invalid FEN {fen!r}: bad rank {rank!r}")
+                color = RED if letter.isupper() else BLACK
+                board[y * BOARD_WIDTH + x] = code | color
+                if code == KING:
+                    if kings[color] is not None or not _in_palace(color, x, y):
+                        raise ValueError(f"Invalid FEN {fen!r}: the {COLOR_NAMES[color]} King is misplaced")
+                    kings[color] = y * BOARD_WIDTH + x
+                x += 1
+            if x != BOARD_WIDTH:
+                raise ValueError(f"Invalid FEN {fen!r}: bad rank {rank!r}")
+        for color in (RED, BLACK):
+            if kings[color] is None:
+                raise ValueError(f"Invalid FEN {fen!r}: the {COLOR_NAMES[color]} King is missing")
+
+        side = fields[1] if len(fields) > 1 else 'w'
+        if side not in ('w', 'r', 'b'):
+            raise ValueError(f"Invalid FEN {fen!r}: bad side to move {side!r}")
+
+        # The King of the side which has just moved can not be left attacked, it would be captured at once
+        previous = self.board, self.side, self.kings
+        self.board = board
+        self.side = BLACK if side == 'b' else RED
+        self.kings = kings
+        if self.in_check(self.side ^ (RED | BLACK)):
+            self.board, self.side, self.kings = previous
+            raise ValueError(f"Invalid FEN {fen!r}: the side not to move is in check")
+        self.key = self.compute_key()
+        self.evaluation = self.compute_evaluation()
+        self.clear_history()
+
+    def to_fen(self):
+        """
+        Describe the position as a FEN string
+        :return: The FEN string, the move counters are not kept so they are always 0 and 1
+        """
+        ranks = []
+        for y in range(BOARD_HEIGHT):
+            rank = ''
+            empty = 0
+            for piece in self.board[y * BOARD_WIDTH:(y + 1) * BOARD_WIDTH]:
+                if not piece:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = FEN_LETTERS[piece & 7]
+                rank += letter.upper() if piece & RED else letter
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        side = 'w' if self.side == RED else 'b'
+        return f"{'/'.join(ranks)} {side} - - 0 1"
+
+    def copy(self):
+        """
+        Make an independent copy of the position
+        :return: The new Position
+        """
+        position = Position()
+        position.board = bytearray(self.board)
+        position.side = self.side
+        position.kings = dict(self.kings)
+        position.key = self.key
+        position.evaluation = self.evaluation
+        position.history = list(self.history)
+        position.key_index = dict(self.key_index)
+        position.null_plies = list(self.null_plies)
+        return position
+
+    def compute_key(self):
+        """
+        Compute the Zobrist key of the position from scratch
+        :return: A 64-bit int which identifies the position
+        """
+        key = 0 if self.side == RED else ZOBRIST_BLACK_TO_MOVE
+        for sq, piece in enumerate(self.board):
+            if piece:
+                key ^= ZOBRIST_KEYS[piece][sq]
+        return key
+
+    def compute_evaluation(self):
+        """
+        Compute the static values of all pieces from scratch
+        :return: The sum of static values, the greater the value, the better for the red side
+        """
+        evaluation = 0
+        for sq, piece in enumerate(self.board):
+            if piece:
+                evaluation += PIECE_SQUARE_VALUES[piece][sq]
+        return evaluation
+
+    def piece_at(self, x, y):
+        """
+        Get the piece on a point of the board
+        :param x: x coordinate in board
+        :param y: y coordinate in board
+        :return: A tuple (piece_type, color) or None if the point is empty
+        """
+        piece = self.board[y * BOARD_WIDTH + x]
+        if not piece:
+            return None
+        return PIECE_NAMES[piece & 7], COLOR_NAMES[piece & 24]
+
+    def king_position(self, color):
+        """
+        Get the coordinate of the King of one side
+        :param color: The side of the King
+        :return: A tuple (x, y) or None if the King has been captured
+        """
+        sq = self.kings[COLOR_CODES[color]]
+        if sq is None:
+            return None
+        return sq % BOARD_WIDTH, sq // BOARD_WIDTH
+
+    def count_between(self, x1, y1, x2, y2):
+        """
+        Count the pieces strictly between two points on the same line
+        :return: The number of pieces in between
+        """
+        board = self.board
+        if x1 == x2:
+            return sum(1 for y in range(min(y1, y2) + 1, max(y1, y2)) if board[y * BOARD_WIDTH + x1])
+        return sum(1 for x in range(min(x1, x2) + 1, max(x1, x2)) if board[y1 * BOARD_WIDTH + x])
+
+    def winner(self):
+        """
+        Check whether one side has captured the King of the other side or the side to move has no legal action
+        A side which can not move loses, whether it is checkmated or stalemated, and so does a side which repeats the
+        position for the third time by perpetual check or chase
+        :return: The color of the winner or None
+        """
+        if self.kings[RED] is None:
+            return 'black'
+        if self.kings[BLACK] is None:
+            return 'red'
+        if not self.legal_next_actions():
+            return COLOR_NAMES[self.side ^ (RED | BLACK)]
+        if self.repetition_count() >= 2:
+            winner = self.repetition_winner()
+            if winner is not None:
+                return COLOR_NAMES[winner]
+        return None
+
+    def is_repetition(self):
+        """
+        Check whether the current position has occurred before since the last pass, which takes constant time
+        :return: True if the position is repeated
+        """
+        return self.key_index.get(self.key, -1) >= (self.null_plies[-1] if self.null_plies else 0)
+
+    def repetition_count(self):
+        """
+        Count the earlier occurrences of the current position since the last pass
+        :return: The number of earlier occurrences
+        """
+        start = self.null_plies[-1] if self.null_plies else 0
+        count = 0
+        index = self.key_index.get(self.key, -1)
+        while index >= start:
+            count += 1
+            index = self.history[index][1]
+        return count
+
+    def repetition_winner(self):
+        """
+        Judge a repeated position by the actions since its last occurrence. A side which checks with every one of its
+        actions loses, otherwise a side which chases a piece with every one of its actions loses. If both or neither
+        of the sides do so, the game is drawn
+        A chase is an action after which the side attacks a piece other than the King or a Pawn it did not attack
+        before, and the piece is not protected or is a Chariot attacked by a Horse or a Cannon
+        :return: The color of the side which wins or None for a draw
+        """
+        plies = len(self.history) - self.key_index[self.key]
+        checks = {RED: True, BLACK: True}
+        chases = {RED: True, BLACK: True}
+
+        # Take the actions back one by one, the side to move is the one which has not made the action
+        undone = []
+        for _ in range(plies):
+            mover = self.side ^ (RED | BLACK)
+            checks[mover] = checks[mover] and self.in_check()
+            chased = self.chased_pieces(mover) if chases[mover] else None
+            occupy_info = self.history[-1][2]
+            self.restore(occupy_info)
+            undone.append(occupy_info)
+            if chased is not None:
+                chases[mover] = bool(chased - self.chased_pieces(mover))
+        for occupy_info in reversed(undone):
+            self.occupy(occupy_info)
+
+        for color in (RED, BLACK):
+            other = color ^ (RED | BLACK)
+            if checks[color] and not checks[other]:
+                return other
+        if checks[RED] or checks[BLACK]:
+            return None
+        for color in (RED, BLACK):
+            other = color ^ (RED | BLACK)
+            if chases[color] and not chases[other]:
+                return other
+        return None
+
+    def chased_pieces(self, color):
+        """
+        Find the pieces of the other side which one side threatens to win, a King or a Pawn is never chased and does
+        not chase either
+        :param color: The side attacking
+        :return: A set of the squares of the pieces which are not protected, or are Chariots attacked by a Horse or a
+        Cannon
+        """
+        board = self.board
+        side = self.side
+        self.side = color
+        captures = [action for action in self.valid_next_actions(captures=True)
+                    if board[action & 127] & 7 not in (KING, PAWN) and action >> 14 & 7 not in (KING, PAWN)]
+        self.side = side
+
+        chased = set()
+        for action in captures:
+            source, target = action & 127, action >> 7 & 127
+            if target in chased:
+                continue
+            if board[target] & 7 == CHARIOT and board[source] & 7 in (HORSE, CANNON):
+                chased.add(target)
+                continue
+
+            # The piece is protected if the other side can take back on its square
+            self.side = color
+            occupy_info = self.occupy(action)
+            legal = not self.in_check(color)
+            protected = legal and any(action >> 7 & 127 == target for action in self.valid_next_actions(captures=True))
+            self.restore(occupy_info)
+            self.side = side
+            if legal and not protected:
+                chased.add(target)
+        return chased
+
+    def find_action(self, x1, y1, x2, y2):
+        """
+        Find the valid action which moves the piece at (x1, y1) to (x2, y2)
+        :return: The action or None if the movement is invalid
+        """
+        target = y2 * BOARD_WIDTH + x2
+        action = pack_action(y1 * BOARD_WIDTH + x1, target, self.board[target])
+        if self.is_valid_action(action):
+            return action
+        return None
+
+    def is_valid_action(self, action):
+        """
+        Check whether an action is among the valid actions, only the moves of its piece are generated
+        :param action: An action packed by pack_action, whose captured piece has to match the board too
+        :return: True if the action is valid
+        """
+        return action in self.valid_next_actions(square=action & 127)
+
+    def action_coords(self, action):
+        """
+        Translate an action into its source and target coordinates
+        :param action: An action packed by pack_action
+        :return: A tuple (x1, y1, x2, y2)
+        """
+        source, target = action & 127, action >> 7 & 127
+        return source % BOARD_WIDTH, source // BOARD_WIDTH, target % BOARD_WIDTH, target // BOARD_WIDTH
+
+    def action_to_iccs(self, action):
+        """
+        Write an action in ICCS notation, e.g. h2e2, where files are a to i and ranks are 0 to 9 from the red side
+        :param action: An action packed by pack_action
+        :return: The ICCS string of the action
+        """
+        x1, y1, x2, y2 = self.action_coords(action)
+        return f"{'abcdefghi'[x1]}{9 - y1}{'abcdefghi'[x2]}{9 - y2}"
+
+    def action_from_iccs(self, text):
+        """
+        Read an action in ICCS notation
+        :param text: The ICCS string, e.g. h2e2
+        :return: The valid action or None if the movement is invalid
+        """
+        text = text.strip().lower()
+        if len(text) != 4 or text[0] not in 'abcdefghi' or text[2] not in 'abcdefghi' or \
+                not text[1].isdigit() or not text[3].isdigit():
+            return None
+        return self.find_action('abcdefghi'.index(text[0]), 9 - int(text[1]),
+                                'abcdefghi'.index(text[2]), 9 - int(text[3]))
+
+    def in_check(self, color=None):
+        """
+        Check whether the King of one side is attacked, including by the other King on an open file
+        :param color: The side of the King, the side to move if not given
+        :return: True if the King is attacked
+        """
+        board = self.board
+        color = self.side if color is None else color
+        king = self.kings[color]
+        if king is None:
+            return False
+        enemy = color ^ (RED | BLACK)
+
+        # Chariot and King attack the first piece on a line, Cannon attacks the second one
+        for ray in RAYS[king]:
+            screened = False
+            for sq in ray:
+                piece = board[sq]
+                if not piece:
+                    continue
+                if screened:
+                    if piece == enemy | CANNON:
+                        return True
+                    break
+                if piece == enemy | CHARIOT or piece == enemy | KING:
+                    return True
+                screened = True
+
+        for horse, leg in HORSE_ATTACKS[king]:
+            if board[horse] == enemy | HORSE and not board[leg]:
+                return True
+        for pawn in PAWN_ATTACKS[enemy][king]:
+            if board[pawn] == enemy | PAWN:
+                return True
+        return False
+
+    def legal_next_actions(self):
+        """
+        Get the valid actions which do not leave the King of the side to move attacked
+        :return: A list of actions packed by pack_action
+        """
+        side = self.side
+        legal_actions = []
+        for action in self.valid_next_actions():
+            occupy_info = self.occupy(action)
+            if not self.in_check(side):
+                legal_actions.append(action)
+            self.restore(occupy_info)
+        return legal_actions
+
+    def perft(self, depth):
+        """
+        Count the leaf nodes of the tree of legal actions
+        :param depth: The depth of the tree
+        :return: The number of leaf nodes
+        """
+        if depth <= 0:
+            return 1
+        next_actions = self.legal_next_actions()
+        if depth == 1:
+            return len(next_actions)
+
+        nodes = 0
+        for action in next_actions:
+            occupy_info = self.occupy(action)
+            nodes += self.perft(depth - 1)
+            self.restore(occupy_info)
+        return nodes
+
+    def divide(self, depth):
+        """
+        Count the leaf nodes below every legal action, which helps to find the action a move generator gets wrong
+        :param depth: The depth of the tree, which is at least 1
+        :return: A list of tuple (iccs, nodes)
+        """
+        result = []
+        for action in self.legal_next_actions():
+            occupy_info = self.occupy(action)
+            nodes = self.perft(depth - 1)
+            self.restore(occupy_info)
+            result.append((self.action_to_iccs(action), nodes))
+        return result
+
+    def null_move(self):
+        """
+        Let the other side move without moving a piece, which is undone by calling it again
+        """
+        self.side ^= RED | BLACK
+        self.key ^= ZOBRIST_BLACK_TO_MOVE
+        if self.null_plies and self.null_plies[-1] == len(self.history):
+            self.null_plies.pop()
+        else:
+            self.null_plies.append(len(self.history))
+
+    def static_evaluation(self):
+        """
+        Evaluate the current board and return a score
+        Higher the score means that the side to move has more advantage on current board
+        The weighted number of pieces and the attack strength are kept up to date by occupy and restore
+        :return: The static score value of the current chess board
+        """
+        sign = 1 if self.side == RED else -1
+
+        # King is captured
+        if self.kings[BLACK] is None:
+            return sign * MATE_SCORE
+        if self.kings[RED] is None:
+            return -sign * MATE_SCORE
+
+        return sign * self.evaluation
+
+    def occupy(self, action):
+        """
+        Make the occupy on the board to mark the movement of piece
+        :param action: A valid action packed by pack_action, which knows the piece it eats
+        :return: The action itself, for restore
+        """
+        board = self.board
+        source, target, eaten = action & 127, action >> 7 & 127, action >> 14
+        piece = board[source]
+        key = self.key
+
+        # Move the piece
+        board[target] = piece
+        board[source] = 0
+        self.key ^= ZOBRIST_KEYS[piece][source] ^ ZOBRIST_KEYS[piece][target] ^ ZOBRIST_BLACK_TO_MOVE
+        self.evaluation += PIECE_SQUARE_VALUES[piece][target] - PIECE_SQUARE_VALUES[piece][source]
+        if piece & 7 == KING:
+            self.kings[piece & 24] = target
+
+        # Make a capture
+        if eaten:
+            self.key ^= ZOBRIST_KEYS[eaten][target]
+            self.evaluation -= PIECE_SQUARE_VALUES[eaten][target]
+            if eaten & 7 == KING:
+                self.kings[eaten & 24] = None
+
+        # The other side moves next
+        self.side ^= RED | BLACK
+
+        # Remember the position before the action
+        history = self.history
+        history.append((key, self.key_index.get(key, -1), action))
+        self.key_index[key] = len(history) - 1
+
+        return action
+
+    def restore(self, occupy_info):
+        """
+        Restore the board after occupying.
+        :param occupy_info: The action returned by occupy
+        """
+        board = self.board
+        source, target, eaten = occupy_info & 127, occupy_info >> 7 & 127, occupy_info >> 14
+        piece = board[target]
+
+        # Restore the piece to its original place and the piece which has been eaten
+        board[source] = piece
+        board[target] = eaten
+        self.key ^= ZOBRIST_KEYS[piece][source] ^ ZOBRIST_KEYS[piece][target] ^ ZOBRIST_BLACK_TO_MOVE
+        self.evaluation += PIECE_SQUARE_VALUES[piece][source] - PIECE_SQUARE_VALUES[piece][target]
+        if piece & 7 == KING:
+            self.kings[piece & 24] = source
+        if eaten:
+            self.key ^= ZOBRIST_KEYS[eaten][target]
+            self.evaluation += PIECE_SQUARE_VALUES[eaten][target]
+            if eaten & 7 == KING:
+                self.kings[eaten & 24] = target
+
+        self.side ^= RED | BLACK
+
+        # Forget the position before the action
+        key, previous, _ = self.history.pop()
+        if previous < 0:
+            del self.key_index[key]
+        else:
+            self.key_index[key] = previous
+
+    def valid_next_actions(self, captures=None, square=None):
+        """
+        This method is to get all the valid actions for the side to move each pieces in its side.
+        :param captures: Only captures if True, only actions to empty squares if False, all actions if None
+        :param square: Only the actions of the piece on this square if given
+        :return: A list of actions packed by pack_action represents valid next actions for one side
+        """
+        board = self.board
+        side = self.side
+        valid_next_actions = []  # Init the list of final actions
+
+        # The only piece between two Kings facing each other can not leave the file
+        red_king, black_king = self.kings[RED], self.kings[BLACK]
+        pinned = None
+        if red_king % BOARD_WIDTH == black_king % BOARD_WIDTH:
+            between = [sq for sq in range(black_king + BOARD_WIDTH, red_king, BOARD_WIDTH) if board[sq]]
+            if len(between) == 1:
+                pinned = between[0]
+
+        # Go through all pieces of the side to move
+        for source, piece in enumerate(board) if square is None else ((square, board[square]),):
+            if not piece & side:
+                continue
+            piece_type = piece & 7
+
+            if piece_type == CHARIOT:
+                targets = []
+                for ray in RAYS[source]:
+                    for target in ray:
+                        other = board[target]
+                        if not other:
+                            targets.append(target)
+                        else:
+                            if not other & side:
+                                targets.append(target)
+                            break
+
+            elif piece_type == CANNON:
+                targets = []
+                for ray in RAYS[source]:
+                    screened = False
+                    for target in ray:
+                        other = board[target]
+                        if not screened:
+                            if not other:
+                                targets.append(target)
+                            else:
+                                # Cannon needs one intermittent piece to capture
+                                screened = True
+                        elif other:
+                            if not other & side:
+                                targets.append(target)
+                            break
+
+            elif piece_type == HORSE:
+                targets = [target for target, leg in HORSE_MOVES[source] if not board[leg]]
+            elif piece_type == ELEPHANT:
+                targets = [target for target, eye in ELEPHANT_MOVES[side][source] if not board[eye]]
+            elif piece_type == PAWN:
+                targets = PAWN_MOVES[side][source]
+            elif piece_type == KING:
+                targets = KING_MOVES[side][source]
+            else:
+                targets = ADVISOR_MOVES[side][source]
+
+            for target in targets:
+                # Ensure piece can not move to position with piece with same color
+                other = board[target]
+                if other & side:
+                    continue
+                if captures is not None and bool(other) != captures:
+                    continue
+                # Make sure current movement will not cause two Kings face each other directly
+                if source == pinned and (target - source) % BOARD_WIDTH:
+                    continue
+                if piece_type == KING:
+                    other_king = black_king if side == RED else red_king
+                    if target % BOARD_WIDTH == other_king % BOARD_WIDTH and not any(
+                            board[sq] for sq in range(min(target, other_king) + BOARD_WIDTH,
+                                                      max(target, other_king), BOARD_WIDTH)):
+                        continue
+                valid_next_actions.append(source | target << 7 | other << 14)
+
+        return valid_next_actions
+
+
+class TranspositionTable:
+    """
+    A fixed-size table of searched positions indexed by their Zobrist keys
+    When two positions share a slot, the deeper search is kept unless it is left over from a previous search
+    """
+
+    def __init__(self, size=1 << 20):
+        """
+        :param size: The number of entries, which must be a power of two
+        """
+        self.size = size
+        self.mask = size - 1
+        self.entries = [None] * size
+        self.generation = 0
+
+    def clear(self):
+        """
+        Remove all entries
+        """
+        self.entries = [None] * self.size
+
+    def new_search(self):
+        """
+        Mark the entries stored so far as old so that they can be replaced
+        """
+        self.generation += 1
+
+    def probe(self, key):
+        """
+        Look up a position
+        :param key: The Zobrist key of the position
+        :return: A tuple (key, depth, bound, score, action, generation) or None if the position is not stored
+        """
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, bound, score, action):
+        """
+        Store the result of a search
+        :param key: The Zobrist key of the position
+        :param depth: The remaining depth searched below the position
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param score: The score for the side to move
+        :param action: The best action found or None
+        """
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.entries[index] = (key, depth, bound, score, action, self.generation)
+
+
+class OpeningBook:
+    """
+    The actions played from known positions, read from a sorted file which is memory-mapped and binary-searched,
+    so that opening the book costs nothing however large it is
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The file written by build_opening_book
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < BOOK_HEADER.size:
+            raise ValueError(f"Invalid opening book {path}")
+        magic, initial_key = BOOK_HEADER.unpack_from(self.data)
+        if magic != BOOK_MAGIC or initial_key != position_after('').key:
+            raise ValueError(f"Invalid opening book {path}, it may be built with other Zobrist keys")
+        self.size = (len(self.data) - BOOK_HEADER.size) // BOOK_RECORD.size
+
+    def record(self, index):
+        """
+        :param index: The index of a record
+        :return: A tuple (key, (source_square, target_square), weight)
+        """
+        key, packed_action, weight = BOOK_RECORD.unpack_from(self.data, BOOK_HEADER.size + index * BOOK_RECORD.size)
+        return key, divmod(packed_action, BOARD_WIDTH * BOARD_HEIGHT), weight
+
+    def actions(self, position):
+        """
+        Look up the book actions of a position
+        :param position: The Position to look up
+        :return: A list of (action, weight), only actions legal in the position are kept in case of a key collision
+        """
+        # Find the first record of the key
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.record(middle)[0] < position.key:
+                low = middle + 1
+            else:
+                high = middle
+
+        legal_actions = None
+        result = []
+        for index in range(low, self.size):
+            key, (source, target), weight = self.record(index)
+            if key != position.key:
+                break
+            action = pack_action(source, target, position.board[target])
+            if legal_actions is None:
+                legal_actions = position.legal_next_actions()
+            if action in legal_actions:
+                result.append((action, weight))
+        return result
+
+    def probe(self, position, rng=random):
+        """
+        Choose a book action of a position, the more often an action was played the more likely it is chosen
+        :param position: The Position to look up
+        :param rng: The random number generator
+        :return: The action or None if the position is not in the book
+        """
+        actions = self.actions(position)
+        if not actions:
+            return None
+        return rng.choices([action for action, _ in actions], weights=[weight for _, weight in actions])[0]
+
+    def close(self):
+        self.data.close()
+
+
+def _material_signature(pieces):
+    """
+    Name a set of pieces, e.g. 'KR-KAA' for King and Chariot against King and two Advisors
+    :param pieces: The codes of the pieces
+    :return: The letters of the red pieces and of the black pieces in the order of their codes
+    """
+    pieces = sorted(pieces)
+    red = ''.join(FEN_LETTERS[piece & 7] for piece in pieces if piece & RED)
+    black = ''.join(FEN_LETTERS[piece & 7] for piece in pieces if piece & BLACK)
+    return f"{red}-{black}".upper()
+
+
+def _reachable_squares(piece):
+    """
+    :param piece: The code of a piece
+    :return: The sorted squares the piece can ever stand on
+    """
+    color = piece & (RED | BLACK)
+    moves = {KING: KING_MOVES[color], ADVISOR: ADVISOR_MOVES[color], PAWN: PAWN_MOVES[color],
+             ELEPHANT: [[target for target, _ in targets] for targets in ELEPHANT_MOVES[color]]}.get(piece & 7)
+    if moves is None:
+        return list(range(BOARD_WIDTH * BOARD_HEIGHT))
+
+    # Walk from the initial squares of the piece
+    squares = {y * BOARD_WIDTH + x for x, y in INITIAL_POSITIONS[PIECE_NAMES[piece & 7]]
+               if (y >= BOARD_HEIGHT / 2) == (color == RED)}
+    frontier = list(squares)
+    while frontier:
+        for target in moves[frontier.pop()]:
+            if target not in squares:
+                squares.add(target)
+                frontier.append(target)
+    return sorted(squares)
+
+
+def _mirror_board(board):
+    """
+    Swap the colors of all pieces and turn the board upside down
+    :param board: The board to mirror
+    :return: The mirrored board
+    """
+    mirrored = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+    for sq, piece in enumerate(board):
+        if piece:
+            y, x = divmod(sq, BOARD_WIDTH)
+            mirrored[(BOARD_HEIGHT - 1 - y) * BOARD_WIDTH + x] = piece ^ (RED | BLACK)
+    return mirrored
+
+
+class _TablebaseMaterial:
+    """
+    The index of every placement of a set of pieces
+    Every piece has a slot which ranges over the squares it can reach, identical pieces are kept in the order of
+    their squares so that a placement has only one index, and the side to move is the lowest bit
+    """
+
+    def __init__(self, signature):
+        """
+        :param signature: The pieces, e.g. 'KR-KAA', see _material_signature
+        """
+        red, _, black = signature.upper().partition('-')
+        pieces = []
+        for letters, color in ((red, RED), (black, BLACK)):
+            for letter in letters:
+                if letter.lower() not in FEN_CODES:
+                    raise ValueError(f"Invalid material {signature!r}")
+                pieces.append(FEN_CODES[letter.lower()] | color)
+        if pieces.count(KING | RED) != 1 or pieces.count(KING | BLACK) != 1:
+            raise ValueError(f"Invalid material {signature!r}: every side needs one King")
+
+        self.pieces = sorted(pieces)
+        self.signature = _material_signature(self.pieces)
+        self.squares = [_reachable_squares(piece) for piece in self.pieces]
+        self.local = [{sq: i for i, sq in enumerate(squares)} for squares in self.squares]
+        self.same_as_previous = [slot > 0 and piece == self.pieces[slot - 1] for slot, piece in enumerate(self.pieces)]
+
+        # The last slot changes fastest, like itertools.product
+        self.radices = [0] * len(self.pieces)
+        radix = 1
+        for slot in reversed(range(len(self.pieces))):
+            self.radices[slot] = radix
+            radix *= len(self.squares[slot])
+        self.size = radix * 2
+
+    def index(self, squares, side):
+        """
+        :param squares: The square of every slot
+        :param side: The side to move
+        :return: The index of the placement
+        """
+        index = 0
+        for local, radix, sq in zip(self.local, self.radices, squares):
+            index += local[sq] * radix
+        return index * 2 + (side == BLACK)
+
+    def index_of(self, board, side):
+        """
+        :param board: A board with exactly the pieces of the material
+        :param side: The side to move
+        :return: The index of the placement or None if a piece stands where it can never go
+        """
+        found = {}
+        for sq, piece in enumerate(board):
+            if piece:
+                found.setdefault(piece, []).append(sq)
+        squares = []
+        for slot, piece in enumerate(self.pieces):
+            sq = found[piece].pop(0)
+            if sq not in self.local[slot]:
+                return None
+            squares.append(sq)
+        return self.index(squares, side)
+
+
+class Tablebase:
+    """
+    The perfect results of endings with few pieces, read from the files written by generate_tablebase
+    A file holds a byte for every placement of its pieces, 0 for a draw or an impossible placement, otherwise the
+    number of plies to the end of the game plus one, which is a win for the side to move when the number is odd
+    The files are memory-mapped, an ending with the colors swapped is looked up in the mirrored file
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: The directory of the files, every file is named after its material, e.g. KR-KAA.tb
+        """
+        self.directory = directory
+        self.tables = {}
+        self.max_pieces = 0
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.tb'):
+                self.load(name[:-3])
+
+    def load(self, signature):
+        """
+        Open the file of an ending
+        :param signature: The material of the ending
+        """
+        material = _TablebaseMaterial(signature)
+        with open(os.path.join(self.directory, signature + '.tb'), 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(data) != len(TABLEBASE_MAGIC) + material.size or data[:len(TABLEBASE_MAGIC)] != TABLEBASE_MAGIC:
+            raise ValueError(f"Invalid tablebase file {signature}.tb")
+        self.tables[material.signature] = (material, data)
+        self.max_pieces = max(self.max_pieces, len(material.pieces))
+
+    def contains(self, signature):
+        """
+        :param signature: The material of an ending
+        :return: True if the ending or the ending with the colors swapped is in the tablebase
+        """
+        red, _, black = _TablebaseMaterial(signature).signature.partition('-')
+        return f"{red}-{black}" in self.tables or f"{black}-{red}" in self.tables
+
+    def probe(self, position):
+        """
+        Look up a position
+        :param position: The Position, the side which has just moved must not be in check
+        :return: A tuple (result, distance) where result is 1 for a win, 0 for a draw and -1 for a loss of the side to
+        move and distance is the number of plies to the end of the game, or None if the position is not in the
+        tablebase
+        """
+        board = position.board
+        side = position.side
+        signature = _material_signature(piece for piece in board if piece)
+        if signature not in self.tables:
+            red, _, black = signature.partition('-')
+            signature = f"{black}-{red}"
+            if signature not in self.tables:
+                return None
+            board = _mirror_board(board)
+            side ^= RED | BLACK
+
+        # The King of the side which has just moved could be captured, which the tablebase does not hold
+        if position.in_check(position.side ^ (RED | BLACK)):
+            return None
+
+        material, data = self.tables[signature]
+        index = material.index_of(board, side)
+        if index is None:
+            return None
+        value = data[len(TABLEBASE_MAGIC) + index]
+        if not value:
+            return 0, 0
+        return 1 if value % 2 == 0 else -1, value - 1
+
+
+class Engine:
+    """
+    The minimax search which finds a move for the side to move in a position
+    """
+
+    def __init__(self, position, depth_limit=2, table=None, time_limit=None, stop_event=None, on_iteration=None,
+                 book=None, tablebase=None, null_move=True, late_move_reductions=True, principal_variation_search=True,
+                 aspiration_windows=True):
+        """
+        :param position: The Position to search, it is restored after every search
+        :param depth_limit: The depth of minimax search tree
+        :param table: The TranspositionTable to share, a new one is created if not given
+        :param time_limit: Milliseconds a search may take, if given the search deepens until the time runs out
+        instead of stopping at depth_limit
+        :param stop_event: An object like threading.Event, the search stops as soon as it is set
+        :param on_iteration: A function called with the engine after every completed iteration
+        :param book: The OpeningBook to play from without searching while the position is in it
+        :param tablebase: The Tablebase which gives the result of positions with few pieces
+        :param null_move: Whether to prune positions which are good enough even if the side to move passes
+        :param late_move_reductions: Whether to search late quiet actions shallower first
+        :param principal_variation_search: Whether to search the actions after the first one with a null window first
+        :param aspiration_windows: Whether to search the root in a window around the value of the previous iteration
+        """
+        self.position = position
+        self.depth_limit = depth_limit
+        self.time_limit = time_limit
+        self.stop_event = stop_event
+        self.on_iteration = on_iteration
+        self.book = book
+        self.tablebase = tablebase
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.principal_variation_search = principal_variation_search
+        self.aspiration_windows = aspiration_windows
+        self.table = table if table is not None else TranspositionTable()
+        self.nodes = 0
+
+        # Counters of the current search, which tell how well the table and the action ordering work
+        self.table_probes = 0
+        self.table_hits = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+
+        # The depth, the total nodes and the seconds spent at the end of every completed iteration
+        self.iterations = []
+
+        # Quiet actions which caused a cutoff, two per depth, and the history score of every action
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * (ACTION_SQUARES + 1)
+
+        # The best line found below every depth of the current iteration
+        self.pv_table = [[] for _ in range(MAX_PLY + 2)]
+
+        # The state of the current iteration
+        self.iteration_depth = 0
+        self.completed_depth = 0
+        self.principal_variation = []
+        self.following_pv = False
+        self.root_values = []
+        self.best_action = None
+        self.best_value = None
+        self.deadline = None
+        self.stopped = False
+
+    def start_evaluation(self):
+        """
+        Start the evaluation for AI to make a decision
+        The search is deepened one ply at a time, the principal variation of an iteration is searched first in the
+        next one
+        :return: The best action for the side to move or None if there is no valid action
+        """
+        self.nodes = 0
+        self.table_probes = 0
+        self.table_hits = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.iterations = []
+        self.completed_depth = 0
+        self.principal_variation = []
+        self.best_action = None
+        self.best_value = None
+        self.stopped = False
+        self.table.new_search()
+        start = time.perf_counter()
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * (ACTION_SQUARES + 1)
+
+        # Play from the book without searching, the value of a book action is unknown
+        if self.book is not None:
+            action = self.book.probe(self.position)
+            if action is not None:
+                self.best_action = action
+                self.principal_variation = [action]
+                return action
+
+        # Play perfectly without searching once the ending is in the tablebase
+        if self.tablebase is not None:
+            result = self.tablebase_action()
+            if result is not None:
+                self.best_action, self.best_value = result
+                self.principal_variation = [self.best_action]
+                return self.best_action
+
+        if self.time_limit is None:
+            self.deadline = None
+            max_depth = self.depth_limit
+        else:
+            self.deadline = time.monotonic() + self.time_limit / 1000
+            max_depth = MAX_DEPTH
+
+        for self.iteration_depth in range(1, max_depth + 1):
+            # Call the minimax algorithm to evaluate
+            value = self.aspiration_search()
+
+            # Only a completed iteration can be trusted
+            if self.stopped or not self.pv_table[0]:
+                break
+            self.best_value = value
+            self.principal_variation = self.pv_table[0]
+            self.best_action = self.principal_variation[0]
+            self.completed_depth = self.iteration_depth
+            self.iterations.append((self.iteration_depth, self.nodes, time.perf_counter() - start))
+            if self.on_iteration is not None:
+                self.on_iteration(self)
+
+            # There is no need to search deeper once a mate is found which no deeper iteration can shorten. A check
+            # extension may find a longer mate before the iteration is deep enough to see a shorter one
+            if abs(value) > MATE_BOUND and MATE_SCORE - abs(value) <= self.iteration_depth:
+                break
+
+        return self.best_action
+
+    def aspiration_search(self):
+        """
+        Search the root in a narrow window around the value of the previous iteration, which cuts off more than the
+        full window. The window is widened on the side the value falls out of until the value falls inside
+        :return: The value of the best action
+        """
+        alpha, beta = -MATE_SCORE, MATE_SCORE
+        window = ASPIRATION_WINDOW
+        if self.aspiration_windows and self.best_value is not None and abs(self.best_value) <= MATE_BOUND:
+            alpha, beta = self.best_value - window, self.best_value + window
+
+        while True:
+            self.following_pv = True
+            value = self.search_root(alpha, beta)
+            if self.stopped:
+                return value
+            if value <= alpha and alpha > -MATE_SCORE:
+                window *= 4
+                alpha = max(value - window, -MATE_SCORE)
+            elif value >= beta and beta < MATE_SCORE:
+                window *= 4
+                beta = min(value + window, MATE_SCORE)
+            else:
+                return value
+
+    def tablebase_value(self, result, depth):
+        """
+        Score a result of the tablebase so that faster wins and slower losses score higher
+        :param result: A tuple (result, distance) from Tablebase.probe
+        :param depth: The current depth of minimax search tree
+        :return: The score for the side to move
+        """
+        outcome, distance = result
+        return outcome * (MATE_SCORE - depth - distance)
+
+    def tablebase_action(self):
+        """
+        Choose the action of the root position with the best result in the tablebase
+        :return: A tuple (action, value) or None if the position or one of its children is not in the tablebase
+        """
+        position = self.position
+        if BOARD_WIDTH * BOARD_HEIGHT - position.board.count(0) > self.tablebase.max_pieces or \
+                self.tablebase.probe(position) is None:
+            return None
+        best = None
+        for action in position.legal_next_actions():
+            occupy_info = position.occupy(action)
+            result = self.tablebase.probe(position)
+            position.restore(occupy_info)
+            if result is None:
+                return None
+            value = -self.tablebase_value(result, 1)
+            if best is None or value > best[1]:
+                best = (action, value)
+        return best
+
+    def search_actions(self, actions, depth, alpha, principal_variation, time_limit=None):
+        """
+        Search a part of the root actions for one iteration of a ParallelEngine
+        :param actions: The root actions to search
+        :param depth: The depth of the iteration
+        :param alpha: The value the root is already sure of
+        :param principal_variation: The principal variation of the previous iteration
+        :param time_limit: Milliseconds the search may take
+        :return: A tuple (best_value, principal_variation, root_values, nodes, stopped)
+        """
+        self.nodes = 0
+        self.stopped = False
+        self.iteration_depth = depth
+        self.completed_depth = depth - 1
+        self.principal_variation = principal_variation
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit / 1000
+        if depth == 1:
+            self.table.new_search()
+            self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+            self.history = [0] * (ACTION_SQUARES + 1)
+
+        value = self.search_root(alpha, MATE_SCORE, actions)
+        return value, self.pv_table[0], self.root_values, self.nodes, self.stopped
+
+    def out_of_time(self):
+        """
+        Check whether the search has to stop, which is checked every few hundred nodes
+        The first iteration always completes so that there is a move to make
+        :return: True if the search has to stop
+        """
+        if not self.stopped and self.completed_depth > 0:
+            if self.deadline is not None and time.monotonic() >= self.deadline or \
+                    self.stop_event is not None and self.stop_event.is_set():
+                self.stopped = True
+        return self.stopped
+
+    def order_actions(self, actions, depth, table_action):
+        """
+        Sort the actions so that the ones most likely to cause a cutoff are searched first
+        The action from the table comes first, then captures of the heaviest piece by the lightest piece, then the
+        killer moves of the depth, then the other actions by their history score
+        :param actions: The list of actions to sort in place
+        :param depth: The current depth of minimax search tree
+        :param table_action: The best action stored for the position or None
+        :return: The sorted list
+        """
+        board = self.position.board
+        history = self.history
+        killer_1, killer_2 = self.killers[depth]
+
+        def priority(action):
+            if action == table_action:
+                return TABLE_ACTION_PRIORITY
+            if action >> 14:
+                return CAPTURE_PRIORITY + _capture_order(board, action)
+            if action == killer_1:
+                return KILLER_PRIORITY + 1
+            if action == killer_2:
+                return KILLER_PRIORITY
+            return history[action & ACTION_SQUARES]
+
+        actions.sort(key=priority, reverse=True)
+        return actions
+
+    def staged_actions(self, depth, table_action):
+        """
+        Generate the actions in the order of order_actions, one stage at a time, so that the captures are not
+        generated when the action from the table causes a cutoff, and the quiet actions are not generated when a
+        capture or a killer move does
+        :param depth: The current depth of minimax search tree
+        :param table_action: The best action stored for the position or None
+        :return: A generator of the actions, the position has to be the same whenever the next one is taken
+        """
+        position = self.position
+        board = position.board
+        if table_action is not None and position.is_valid_action(table_action):
+            yield table_action
+        else:
+            table_action = None
+
+        # Capture the heaviest piece by the lightest piece first
+        captures = position.valid_next_actions(captures=True)
+        captures.sort(key=lambda action: _capture_order(board, action), reverse=True)
+        for action in captures:
+            if action != table_action:
+                yield action
+
+        # The killer moves are only taken if they are still valid quiet actions in the position
+        killers = [killer for killer in self.killers[depth] if killer is not None and killer != table_action and
+                   position.is_valid_action(killer)]
+        yield from killers
+
+        history = self.history
+        quiets = position.valid_next_actions(captures=False)
+        quiets.sort(key=lambda action: history[action & ACTION_SQUARES], reverse=True)
+        for action in quiets:
+            if action != table_action and action not in killers:
+                yield action
+
+    def record_cutoff(self, action, depth, remaining):
+        """
+        Remember a quiet action which caused a cutoff in the killer moves and the history scores
+        :param action: The action which caused the cutoff
+        :param depth: The current depth of minimax search tree
+        :param remaining: The depth searched below the current position
+        """
+        if action >> 14:
+            return
+        killers = self.killers[depth]
+        if killers[0] != action:
+            killers[1] = killers[0]
+            killers[0] = action
+        self.history[action & ACTION_SQUARES] += remaining * remaining
+
+    def search_root(self, alpha, beta, actions=None):
+        """
+        Search every action of the root position
+        When two actions have the same value the one searched first is kept, so the best action of the previous
+        iteration stays unless a better one is found
+        :param alpha: The evaluation value the side to move is already sure of
+        :param beta: The evaluation value the other side is already sure of
+        :param actions: Only search these root actions if given
+        :return: The value of the best action, which is pv_table[0][0]
+        """
+        position = self.position
+        side = position.side
+        self.nodes += 1
+        self.pv_table[0] = []
+        self.root_values = []
+        alpha_origin = alpha
+
+        # Search the principal variation of the previous iteration or the action stored in the table first
+        entry = self.table.probe(position.key)
+        self.table_probes += 1
+        table_action = None
+        if entry is not None:
+            self.table_hits += 1
+            table_action = entry[4]
+        if self.principal_variation:
+            table_action = self.principal_variation[0]
+        next_actions = position.valid_next_actions() if actions is None else list(actions)
+        next_actions = self.order_actions(next_actions, 0, table_action)
+
+        # The root is searched one ply deeper when the side to move is in check
+        remaining = self.iteration_depth - 1 + position.in_check()
+
+        best_value = -MATE_SCORE
+        best_action = None
+        for next_action in next_actions:
+            self.following_pv = bool(self.principal_variation) and next_action == table_action
+            occupy_info = position.occupy(next_action)
+            if position.in_check(side):
+                position.restore(occupy_info)
+                continue
+
+            # The actions after the first one are only proved no better than alpha, see minimax
+            bound = alpha + 1 if best_action is not None and self.principal_variation_search else beta
+            value = -self.minimax(1, remaining, -bound, -alpha)
+            if bound < beta and alpha < value < beta and not self.stopped:
+                value = -self.minimax(1, remaining, -beta, -alpha)
+            position.restore(occupy_info)
+            if self.stopped:
+                return 0
+            self.root_values.append((next_action, value))
+
+            if value > best_value or best_action is None:
+                best_value = value
+                best_action = next_action
+                self.pv_table[0] = [next_action] + self.pv_table[1]
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    self.record_cutoff(next_action, 0, self.iteration_depth)
+                    break
+
+        # The bounds of a part of the actions do not hold for the position
+        if best_action is not None and actions is None:
+            if best_value <= alpha_origin:
+                bound = UPPER_BOUND
+            elif best_value >= beta:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            self.table.store(position.key, remaining + 1, bound, best_value, best_action)
+
+        return best_value
+
+    def minimax(self, depth, remaining, alpha, beta, allow_null=True):
+        """
+        The algorithm implements the minimax evaluation in negamax form, every score is for the side to move
+        Only legal actions are searched, a side without any, whether checkmated or stalemated, has lost. Mates score
+        MATE_SCORE less the depth of the mate, so that faster mates are preferred
+        :param depth: The current depth of minimax search tree
+        :param remaining: The depth to search below the current position, which is less than the iteration depth
+        minus depth where the search has been reduced and more where it has been extended
+        :param alpha: The evaluation value the side to move is already sure of
+        :param beta: The evaluation value the other side is already sure of
+        :param allow_null: Whether the side to move may pass, which is not allowed right after a pass
+        :return: The static evaluation at leaf nodes or the mate score when game over
+        """
+        position = self.position
+        self.nodes += 1
+        if self.nodes & 255 == 0 and self.out_of_time():
+            return 0
+        alpha_origin = alpha
+        self.pv_table[depth] = []
+
+        # The King of the side to move can only be missing if the position was set up with an illegal action
+        if position.kings[position.side] is None:
+            return depth - MATE_SCORE
+        if depth >= MAX_PLY:
+            return position.static_evaluation()
+
+        # A repeated position is drawn unless it is repeated by perpetual check or chase, then the cycle is not searched
+        if position.is_repetition():
+            winner = position.repetition_winner()
+            if winner is None:
+                return 0
+            return MATE_SCORE - depth if winner == position.side else depth - MATE_SCORE
+
+        # Whether the current node is on the principal variation of the previous iteration
+        following_pv = self.following_pv and depth < len(self.principal_variation)
+
+        # A check is searched one ply deeper, so that the search never stops while the King is attacked. The table is
+        # probed with the extended depth, which is the one it is stored with
+        in_check = position.in_check()
+        if in_check:
+            remaining += 1
+
+        # Reuse the result if the position has been searched deep enough, mate scores are stored from the position
+        entry = self.table.probe(position.key)
+        self.table_probes += 1
+        table_action = None
+        if entry is not None:
+            self.table_hits += 1
+            table_action = entry[4]
+            if not following_pv and entry[1] >= remaining:
+                bound, score = entry[2], entry[3]
+                if score > MATE_BOUND:
+                    score -= depth
+                elif score < -MATE_BOUND:
+                    score += depth
+                if bound == EXACT or bound == LOWER_BOUND and score >= beta or \
+                        bound == UPPER_BOUND and score <= alpha:
+                    return score
+
+        # The result of an ending with few pieces is known
+        tablebase = self.tablebase
+        if tablebase is not None and BOARD_WIDTH * BOARD_HEIGHT - position.board.count(0) <= tablebase.max_pieces:
+            result = tablebase.probe(position)
+            if result is not None:
+                return self.tablebase_value(result, depth)
+
+        # Resolve the captures left at the depth limit
+        if remaining <= 0:
+            return self.quiescence(depth, alpha, beta)
+
+        # If the position still beats beta after passing, a real action would beat it too. Passing is not tried in
+        # check, twice in a row, or without a Chariot, Horse or Cannon, since then every action may make the position
+        # worse and passing would be better than any of them
+        board = position.board
+        side = position.side
+        if self.null_move and allow_null and not following_pv and not in_check and remaining > NULL_MOVE_REDUCTION \
+                and position.static_evaluation() >= beta and board.count(side | CHARIOT) + board.count(side | HORSE) + \
+                board.count(side | CANNON) > 0:
+            reduction = NULL_MOVE_REDUCTION + (remaining >= 6)
+            position.null_move()
+            self.following_pv = False
+            value = -self.minimax(depth + 1, remaining - 1 - reduction, -beta, -beta + 1, False)
+            position.null_move()
+            if self.stopped:
+                return 0
+            if value >= beta:
+                return beta
+
+        # Search the action of the principal variation or stored in the table first
+        if following_pv:
+            table_action = self.principal_variation[depth]
+        next_actions = self.staged_actions(depth, table_action)
+        killers = self.killers[depth]
+
+        # Go through all legal actions
+        best_value = depth - MATE_SCORE
+        best_action = None
+        searched = 0
+        for next_action in next_actions:
+            self.following_pv = following_pv and next_action == table_action
+            quiet = not next_action >> 14
+            occupy_info = position.occupy(next_action)
+            if position.in_check(side):
+                position.restore(occupy_info)
+                continue
+
+            # Late quiet actions are unlikely to be the best, so they are searched shallower first and searched again
+            # at full depth only if they beat alpha. Checks and evasions are never reduced
+            reduction = 0
+            if self.late_move_reductions and searched >= LATE_MOVE_INDEX and remaining >= 3 and quiet and \
+                    not in_check and next_action not in killers and not position.in_check():
+                reduction = 2 if searched >= VERY_LATE_MOVE_INDEX and remaining >= 6 else 1
+
+            # The first action is searched with the full window. The others are only proved no better than alpha with a
+            # null window, which cuts off sooner, and are searched again with the full window if they are better
+            bound = alpha + 1 if searched and self.principal_variation_search else beta
+            value = -self.minimax(depth + 1, remaining - 1 - reduction, -bound, -alpha)
+            if reduction and value > alpha and not self.stopped:
+                value = -self.minimax(depth + 1, remaining - 1, -bound, -alpha)
+            if bound < beta and alpha < value < beta and not self.stopped:
+                value = -self.minimax(depth + 1, remaining - 1, -beta, -alpha)
+            position.restore(occupy_info)
+            if self.stopped:
+                return 0
+            searched += 1
+
+            # Choose the larger one
+            if value > best_value:
+                best_value = value
+                best_action = next_action
+                if value > alpha:
+                    alpha = value
+                    self.pv_table[depth] = [next_action] + self.pv_table[depth + 1]
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        if searched == 1:
+                            self.first_cutoffs += 1
+                        self.record_cutoff(next_action, depth, remaining)
+                        break
+
+        # No action is known to be best when all of them fail low
+        if best_value <= alpha_origin:
+            bound = UPPER_BOUND
+            best_action = table_action
+        elif best_value >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        score = best_value
+        if score > MATE_BOUND:
+            score += depth
+        elif score < -MATE_BOUND:
+            score -= depth
+        self.table.store(position.key, remaining, bound, score, best_action)
+
+        return best_value
+
+    def quiescence(self, depth, alpha, beta):
+        """
+        Search only the captures until the position is quiet, so that the static evaluation is not taken in the
+        middle of an exchange. A side in check can not stand pat, so all its evasions are searched
+        :param depth: The current depth of minimax search tree
+        :param alpha: The evaluation value the side to move is already sure of
+        :param beta: The evaluation value the other side is already sure of
+        :return: The evaluation of the position after the captures worth making
+        """
+        position = self.position
+        board = position.board
+        side = position.side
+        self.nodes += 1
+        if self.nodes & 255 == 0 and self.out_of_time():
+            return 0
+        if position.kings[side] is None:
+            return depth - MATE_SCORE
+
+        in_check = position.in_check()
+        if in_check:
+            # Every evasion is searched, the side has lost if there is none
+            stand_pat = None
+            best_value = depth - MATE_SCORE
+            actions = position.valid_next_actions()
+        else:
+            # The side to move can always stop capturing, which is its stand pat
+            stand_pat = position.static_evaluation()
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            best_value = stand_pat
+            actions = position.valid_next_actions(captures=True)
+
+        # Capture the heaviest piece by the lightest piece first
+        actions.sort(key=lambda action: _capture_order(board, action), reverse=True)
+
+        for action in actions:
+            # Skip the captures which can not raise alpha even with a positional gain
+            eaten = action >> 14
+            if stand_pat is not None and eaten & 7 != KING and \
+                    stand_pat + abs(PIECE_SQUARE_VALUES[eaten][action >> 7 & 127]) + DELTA_MARGIN <= alpha:
+                continue
+
+            occupy_info = position.occupy(action)
+            if position.in_check(side):
+                position.restore(occupy_info)
+                continue
+            value = -self.quiescence(depth + 1, -beta, -alpha)
+            position.restore(occupy_info)
+            if self.stopped:
+                return 0
+
+            if value > best_value:
+                best_value = value
+                if value >= beta:
+                    break
+                alpha = max(alpha, value)
+
+        return best_value
+
+
+# The Engine of every process in the pool of a ParallelEngine, which keeps its transposition table between tasks
+_pool_engine = None
+
+
+def _init_pool_engine(stop_event):
+    """
+    Create the Engine of a process in the pool
+    :param stop_event: The event shared by the pool to stop the searches
+    """
+    global _pool_engine
+    _pool_engine = Engine(None, stop_event=stop_event)
+
+
+def _search_pool_actions(position, actions, depth, alpha, principal_variation, time_limit):
+    """
+    Search a part of the root actions in a process of the pool, see Engine.search_actions
+    """
+    _pool_engine.position = position
+    return _pool_engine.search_actions(actions, depth, alpha, principal_variation, time_limit)
+
+
+class ParallelEngine:
+    """
+    The search which splits the root actions of every iteration across a pool of processes
+    The first action is searched alone to get a bound, then the others are shared out and searched against it
+    Only a part of the interface of Engine is supported: depth_limit, time_limit, start_evaluation, stop, and the
+    results best_action, best_value, principal_variation, completed_depth and nodes. There is no book, tablebase,
+    shared table, stop_event, on_iteration or switch of a search feature, and iterations and the other counters of
+    Engine are not kept. The command line, UCCI and the GUI do not use it
+    """
+
+    def __init__(self, position, depth_limit=2, time_limit=None, workers=None):
+        """
+        :param position: The Position to search
+        :param depth_limit: The depth of minimax search tree
+        :param time_limit: Milliseconds a search may take, see Engine
+        :param workers: The number of processes, which is the number of CPUs if not given
+        """
+        self.position = position
+        self.depth_limit = depth_limit
+        self.time_limit = time_limit
+        self.workers = workers or os.cpu_count() or 1
+        self.nodes = 0
+
+        context = multiprocessing.get_context('spawn')
+        self.stop_event = context.Event()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                            initializer=_init_pool_engine, initargs=(self.stop_event,))
+
+        # The result of the last completed iteration
+        self.completed_depth = 0
+        self.principal_variation = []
+        self.best_action = None
+        self.best_value = None
+
+    def start_evaluation(self):
+        """
+        Start the evaluation for AI to make a decision
+        :return: The best action for the side to move or None if there is no valid action
+        """
+        self.nodes = 0
+        self.completed_depth = 0
+        self.principal_variation = []
+        self.best_action = None
+        self.best_value = None
+        self.stop_event.clear()
+
+        next_actions = self.position.legal_next_actions()
+        if not next_actions:
+            return None
+        root_values = {}
+        deadline = None if self.time_limit is None else time.monotonic() + self.time_limit / 1000
+        max_depth = self.depth_limit if self.time_limit is None else MAX_DEPTH
+
+        for depth in range(1, max_depth + 1):
+            # The first iteration always completes so that there is a move to make
+            time_limit = None
+            if deadline is not None and depth > 1:
+                time_limit = (deadline - time.monotonic()) * 1000
+                if time_limit <= 0:
+                    break
+
+            # Search the best action of the previous iteration first, then the others by their previous values
+            next_actions.sort(key=lambda action: (action == self.best_action, root_values.get(action, 0)),
+                              reverse=True)
+            result = self.executor.submit(_search_pool_actions, self.position, next_actions[:1], depth,
+                                          -MATE_SCORE, self.principal_variation, time_limit).result()
+            best_value, principal_variation, values, nodes, stopped = result
+            self.nodes += nodes
+            results = []
+            if not stopped and len(next_actions) > 1:
+                futures = [self.executor.submit(_search_pool_actions, self.position, next_actions[1 + i::self.workers],
+                                                depth, best_value, [], time_limit)
+                           for i in range(min(self.workers, len(next_actions) - 1))]
+                results = [future.result() for future in futures]
+
+            # Only a completed iteration can be trusted
+            if stopped or any(result[4] for result in results):
+                self.nodes += sum(result[3] for result in results)
+                break
+
+            # Choose the larger value, the action searched earlier is kept when values are equal
+            root_values = dict(values)
+            order = {action: index for index, action in enumerate(next_actions)}
+            for value, line, values, nodes, _ in sorted(results, key=lambda result: order[result[1][0]]):
+                self.nodes += nodes
+                root_values.update(values)
+                if value > best_value:
+                    best_value = value
+                    principal_variation = line
+            self.best_value = best_value
+            self.principal_variation = principal_variation
+            self.best_action = principal_variation[0]
+            self.completed_depth = depth
+
+            # There is no need to search deeper once a mate is found which no deeper iteration can shorten
+            if abs(best_value) > MATE_BOUND and MATE_SCORE - abs(best_value) <= depth:
+                break
+
+        return self.best_action
+
+    def stop(self):
+        """
+        Stop the running search, which still returns the best action of its last completed depth
+        """
+        self.stop_event.set()
+
+    def close(self):
+        """
+        Shut down the pool of processes
+        """
+        self.stop_event.set()
+        self.executor.shutdown(cancel_futures=True)
+
+
+class _Cancellation:
+    """
+    Tell a search in the worker process whether it has been cancelled
+    """
+
+    def __init__(self, cancelled_id, search_id):
+        """
+        :param cancelled_id: The shared id of the latest cancelled search
+        :param search_id: The id of the search
+        """
+        self.cancelled_id = cancelled_id
+        self.search_id = search_id
+
+    def is_set(self):
+        return self.cancelled_id.value >= self.search_id
+
+
+def _search_worker_loop(requests, results, cancelled_id, book_path=None, tablebase_path=None):
+    """
+    The main loop of the worker process, which keeps its transposition table between searches
+    :param requests: The queue of (search_id, position, depth_limit, time_limit), None to exit
+    :param results: The queue of (search_id, best_action, best_value, completed_depth, nodes, principal_variation)
+    :param cancelled_id: The shared id of the latest cancelled search
+    :param book_path: The file of the OpeningBook to play from
+    :param tablebase_path: The directory of the Tablebase to play from
+    """
+    table = TranspositionTable()
+    book = OpeningBook(book_path) if book_path is not None else None
+    tablebase = Tablebase(tablebase_path) if tablebase_path is not None else None
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        search_id, position, depth_limit, time_limit = request
+        engine = Engine(position, depth_limit, table, time_limit, _Cancellation(cancelled_id, search_id), book=book,
+                        tablebase=tablebase)
+        action = engine.start_evaluation()
+        results.put((search_id, action, engine.best_value, engine.completed_depth, engine.nodes,
+                     engine.principal_variation))
+
+
+class SearchWorker:
+    """
+    Run the searches of an Engine in a separate process, so that the caller is not blocked and not held back by
+    the GIL
+    """
+
+    def __init__(self, book_path=None, tablebase_path=None):
+        """
+        :param book_path: The file of the OpeningBook to play from
+        :param tablebase_path: The directory of the Tablebase to play from
+        """
+        context = multiprocessing.get_context('spawn')
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.cancelled_id = context.Value('q', 0)
+        self.search_id = 0
+        self.process = context.Process(target=_search_worker_loop,
+                                       args=(self.requests, self.results, self.cancelled_id, book_path,
+                                             tablebase_path), daemon=True)
+        self.process.start()
+
+    def start(self, position, depth_limit=2, time_limit=None):
+        """
+        Start searching a position
+        :param position: The Position to search, which is copied to the worker process
+        :param depth_limit: The depth of minimax search tree
+        :param time_limit: Milliseconds the search may take, see Engine
+        :return: The id of the search
+        """
+        self.search_id += 1
+        self.requests.put((self.search_id, position, depth_limit, time_limit))
+        return self.search_id
+
+    def stop(self):
+        """
+        Stop all the searches started so far, each of them still returns the best action of its last completed depth
+        """
+        self.cancelled_id.value = self.search_id
+
+    def poll(self):
+        """
+        Get the result of a finished search without waiting
+        :return: A tuple (search_id, best_action, best_value, completed_depth, nodes, principal_variation) or None
+        """
+        try:
+            return self.results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """
+        Stop the searches and the worker process
+        """
+        self.stop()
+        self.requests.put(None)
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class UcciFrontend:
+    """
+    Speak the UCCI protocol on text streams, so that the engine can be run by Xiangqi GUIs and tournament managers
+    The search runs in a thread, so that stop and quit are still read while it is searching
+    """
+
+    def __init__(self, input_stream=None, output_stream=None, book=None, tablebase=None):
+        """
+        :param input_stream: The stream the commands are read from, stdin if not given
+        :param output_stream: The stream the replies are written to, stdout if not given
+        :param book: The OpeningBook to play from
+        :param tablebase: The Tablebase to play from
+        """
+        self.input_stream = input_stream if input_stream is not None else sys.stdin
+        self.output_stream = output_stream if output_stream is not None else sys.stdout
+        self.output_lock = threading.Lock()
+        self.table = TranspositionTable()
+        self.book = book
+        self.tablebase = tablebase
+        self.position = position_after('')
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.engine = None
+
+        # A search started with go ponder sends its best action only after ponderhit or stop, then ponderhit starts
+        # the clock of the move
+        self.ponder_wait = threading.Event()
+        self.ponder_wait.set()
+        self.ponder_time_limit = None
+
+    def send(self, line):
+        """
+        Write a line of reply, replies are written by both the reading and the searching thread
+        :param line: The line without the newline
+        """
+        with self.output_lock:
+            self.output_stream.write(line + '\n')
+            self.output_stream.flush()
+
+    def run(self):
+        """
+        Answer the commands until quit or the end of the input
+        """
+        for line in self.input_stream:
+            if not self.handle(line.split()):
+                break
+        self.stop_search()
+
+    def handle(self, tokens):
+        """
+        Answer one command, unknown commands are ignored
+        :param tokens: The words of the command
+        :return: False if the frontend should quit
+        """
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == 'ucci':
+            self.send('id name ChineseChess-GUI')
+            self.send('ucciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'setoption':
+            if arguments[:1] == ['newgame']:
+                self.stop_search()
+                self.table.clear()
+        elif command == 'position':
+            self.set_position(arguments)
+        elif command == 'go':
+            self.go(arguments)
+        elif command == 'ponderhit':
+            self.ponder_hit()
+        elif command == 'stop':
+            self.stop_search()
+        elif command == 'quit':
+            self.stop_search()
+            self.send('bye')
+            return False
+        return True
+
+    def set_position(self, arguments):
+        """
+        Set up the position to search, the moves are played until an invalid one
+        :param arguments: 'startpos' or 'fen' and the FEN fields, followed by 'moves' and ICCS moves
+        """
+        self.stop_search()
+        moves = []
+        if 'moves' in arguments:
+            index = arguments.index('moves')
+            arguments, moves = arguments[:index], arguments[index + 1:]
+        if arguments[:1] == ['fen']:
+            fen = ' '.join(arguments[1:])
+        else:
+            fen = INITIAL_FEN
+        try:
+            position = position_after('', fen)
+        except ValueError as e:
+            self.send(f'info string {e}')
+            return
+        for move in moves:
+            action = position.action_from_iccs(move)
+            if action is None or action not in position.legal_next_actions():
+                self.send(f'info string Invalid move {move}')
+                break
+            position.occupy(action)
+        self.position = position
+
+    def go(self, arguments):
+        """
+        Start searching the position, bestmove is sent when the search ends
+        :param arguments: 'depth' d, 'movetime' ms, 'time' ms with 'movestogo' n or 'increment' ms, or 'infinite',
+        after 'ponder' if the position is the one after the expected reply
+        """
+        self.stop_search()
+        options = {name: arguments[index + 1] for index, name in enumerate(arguments[:-1])
+                   if name in ('depth', 'movetime', 'time', 'movestogo', 'increment')}
+        depth_limit = MAX_DEPTH
+        time_limit = None
+        try:
+            if 'depth' in options:
+                depth_limit = max(1, min(MAX_DEPTH, int(options['depth'])))
+            if 'movetime' in options:
+                time_limit = int(options['movetime'])
+            elif 'time' in options:
+                # Spend an even share of the time left on every move
+                time_left = int(options['time'])
+                moves_to_go = int(options.get('movestogo', 30))
+                time_limit = min(time_left // max(moves_to_go, 1) + int(options.get('increment', 0)), time_left // 2)
+        except ValueError:
+            self.send(f"info string Invalid go command {' '.join(arguments)}")
+            return
+        if 'infinite' in arguments:
+            depth_limit, time_limit = MAX_DEPTH, None
+
+        # The clock does not run while pondering
+        self.ponder_time_limit = None
+        self.ponder_wait.set()
+        if 'ponder' in arguments:
+            self.ponder_time_limit, time_limit = time_limit, None
+            self.ponder_wait.clear()
+
+        self.stop_event.clear()
+        engine = Engine(self.position.copy(), depth_limit, self.table, time_limit, self.stop_event, self.send_info,
+                        self.book, self.tablebase)
+        self.engine = engine
+        self.thread = threading.Thread(target=self.search, args=(engine,), daemon=True)
+        self.thread.start()
+
+    def ponder_hit(self):
+        """
+        The expected reply has been made, the search goes on as a normal one
+        """
+        if self.engine is not None and self.ponder_time_limit is not None:
+            self.engine.time_limit = self.ponder_time_limit
+            self.engine.deadline = time.monotonic() + self.ponder_time_limit / 1000
+        self.ponder_time_limit = None
+        self.ponder_wait.set()
+
+    def search(self, engine):
+        """
+        Run a search and send its best action, this is the target of the searching thread
+        :param engine: The Engine to run
+        """
+        action = engine.start_evaluation()
+        self.ponder_wait.wait()
+        if action is None:
+            self.send('nobestmove')
+        else:
+            self.send(f'bestmove {engine.position.action_to_iccs(action)}')
+
+    def send_info(self, engine):
+        """
+        Send the result of a completed iteration
+        :param engine: The Engine searching
+        """
+        depth, nodes, elapsed = engine.iterations[-1]
+        score = engine.best_value
+        pv = ' '.join(engine.position.action_to_iccs(action) for action in engine.principal_variation)
+        self.send(f'info depth {depth} score {score} time {int(elapsed * 1000)} nodes {nodes} '
+                  f'nps {int(nodes / max(elapsed, 1e-9))} pv {pv}')
+
+    def stop_search(self):
+        """
+        Stop the search if there is one and wait until its best action has been sent
+        """
+        if self.thread is not None:
+            self.stop_event.set()
+            self.ponder_wait.set()
+            self.thread.join()
+            self.thread = None
+            self.engine = None
+
+
+class ChineseChessGUI:
+    # Explanations for movements which do not fit the piece at all
+    MOVE_HINTS = {
+        'King': "King can only move one block vertically or horizontally!",
+        'Chariot': "Chariot can only move vertically or horizontally!",
+        'Horse': "Horse can only move to the opposite corner of a rectangle formed by 1x2 blocks!",
+        'Cannon': "Cannon can only move vertically or horizontally!",
+        'Pawn': "Pawn can only move one block vertically or horizontally!",
+        'Advisor': "Advisor can only move diagonally by a block!",
+        'Elephant': "Elephant can only move to the opposite corner of a square formed by 2x2 blocks!"
+    }
+
+    def __init__(self, root, book_path=None, tablebase_path=None):
+        """
+        :param root: The Tk main window
+        :param book_path: The file of the OpeningBook AI plays from
+        :param tablebase_path: The directory of the Tablebase AI plays from
+        """
+        # Tk is only imported by the GUI, so that the engine runs on a Python without it, and so do its processes
+        import tkinter as tk
+
+        # Constants for the board size
+        self.BOARD_WIDTH = BOARD_WIDTH
+        self.BOARD_HEIGHT = BOARD_HEIGHT
+        self.SQUARE_SIZE = 60
+
+        # AI searches in a separate process, the result is polled from the Tk event loop
+        self.root = root
+        self.worker = SearchWorker(book_path, tablebase_path)
+        self.search_id = None
+
+        # The search of the position after the reply AI expects, which runs while the player thinks
+        self.ponder_id = None
+        self.ponder_action = None
+        self.ponder_limits = None
+        root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Draw the board and frames
+        self.create_frame_1(root)
+        self.canvas = tk.Canvas(root, width=(self.BOARD_WIDTH + 0.5) * self.SQUARE_SIZE,
+                                height=(self.BOARD_HEIGHT + 0.5) * self.SQUARE_SIZE)
+        self.canvas.pack(side='top')
+        self.canvas.bind("<Button-1>", self.player_move_piece)
+        self.create_frame_2(root)
+        self.draw_board()
+
+        # Dictionary to keep track of the canvas item of pieces
+        self.canvas_items = {}
+
+        # Begin a new game
+        self.new_game()
+
+    def create_frame_1(self, root):
+        """
+        Create the frame above the board canvas
+        :param root: The tk.Window
+        """
+        import tkinter as tk
+
+        # Indicate the depth of search tree
+        self.difficulty = tk.IntVar()
+        self.difficulty.set(2)
+
+        # Seconds AI may think per move, 0 to search to the depth of the difficulty instead
+        self.move_time = tk.IntVar()
+        self.move_time.set(0)
+
+        # Whether AI moves first
+        self.ai_first = tk.BooleanVar()
+
+        # Whether AI searches the expected reply while the player thinks
+        self.ponder = tk.BooleanVar()
+        self.ponder.set(True)
+
+        self.frame_1 = tk.Frame(root)
+        self.frame_1.pack(side='top')
+
+        self.label2 = tk.Label(self.frame_1, text='Difficulty:', font=('Arial', 20))
+        self.label2.grid(row=0, column=0)
+
+        # Null-move pruning and late-move reductions need a few plies left to search, so they only work from depth 4
+        self.scale = tk.Scale(self.frame_1, font=('Arial', 15), variable=self.difficulty, orient=tk.HORIZONTAL, from_=1,
+                              to=MAX_DIFFICULTY)
+        self.scale.grid(row=0, column=1)
+
+        self.check = tk.Checkbutton(self.frame_1, text='AI goes first    ', font=('Arial', 20), variable=self.ai_first,
+                                    command=self.ai_move_first)
+        self.check.grid(row=0, column=2)
+
+        self.button1 = tk.Button(self.frame_1, text="New Game", font=('Arial', 20), fg="blue", command=self.new_game)
+        self.button1.grid(row=0, column=3)
+
+        self.button2 = tk.Button(self.frame_1, text="Stop", font=('Arial', 20), fg="red", command=self.stop_ai)
+        self.button2.grid(row=0, column=4)
+
+        self.label5 = tk.Label(self.frame_1, text='Seconds per move:', font=('Arial', 15))
+        self.label5.grid(row=1, column=0)
+
+        self.scale2 = tk.Scale(self.frame_1, font=('Arial', 15), variable=self.move_time, orient=tk.HORIZONTAL, from_=0,
+                               to=10)
+        self.scale2.grid(row=1, column=1)
+
+        self.check2 = tk.Checkbutton(self.frame_1, text='Think on your time', font=('Arial', 15), variable=self.ponder)
+        self.check2.grid(row=1, column=2)
+
+    def close(self):
+        """
+        Stop the AI and close the window
+        """
+        self.worker.close()
+        self.root.destroy()
+
+    def stop_ai(self):
+        """
+        Make AI move now with the best move it has found so far
+        """
+        if self.search_id is not None:
+            self.worker.stop()
+
+    def ai_move_first(self):
+        """
+        AI make the first move
+        """
+        self.check.config(state='disabled')
+        self.ai_move_piece()
+
+    def new_game(self):
+        """
+        Begin a new game
+        """
+        # Cancel the searches of the previous game
+        if self.search_id is not None or self.ponder_id is not None:
+            self.worker.stop()
+            self.search_id = None
+            self.ponder_id = None
+            self.ponder_action = None
+
+        # Destroy the previous board
+        for item_id in self.canvas_items.values():
+            self.canvas.delete(item_id)
+
+        # Init the new board
+        self.position = Position()
+        self.position.place_pieces()
+        self.canvas_items = {}
+        self.place_pieces()
+
+        # Set the default widget
+        self.check.deselect()
+        self.check.config(state='normal')
+
+        # Init the variables
+        self.moves_count = 0
+        self.is_moving = False
+
+        self.label3.config(text="")
+        self.label4.config(text="")
+
+    def create_frame_2(self, root):
+        """
+        Create the frame below board canvas to show some information
+        :param root: The tk.Window
+        """
+        import tkinter as tk
+
+        self.frame_2 = tk.Frame(root)
+        self.frame_2.pack(side='top')
+
+        self.label3 = tk.Label(self.frame_2, text='Choose a piece...', font=('Arial', 20))
+        self.label3.grid(row=2, column=0, columnspan=2)
+
+        # This label is to show explanation for invalid move
+        self.label4 = tk.Label(self.frame_2, text='', font=('Arial', 15), fg='red')
+        self.label4.grid(row=3, column=0, columnspan=2)
+
+    def cord(self, coord):
+        """
+        Translate the coordinate in board into canvas
+        :param coord: coordinate in board
+        :return: coordinate in canvas
+        """
+        return (coord + 0.5) * self.SQUARE_SIZE
+
+    def draw_board(self):
+        """
+        Draw the board
+        """
+        for i in range(self.BOARD_WIDTH):
+            self.canvas.create_line(self.cord(i), self.cord(0), self.cord(i), self.cord(self.BOARD_HEIGHT - 1))
+
+        for i in range(self.BOARD_HEIGHT):
+            self.canvas.create_line(self.cord(0), self.cord(i), self.cord(self.BOARD_WIDTH - 1), self.cord(i))
+
+        # Draw the river
+        self.canvas.create_rectangle(self.cord(0), self.cord(4), self.cord(self.BOARD_WIDTH - 1), self.cord(5),
+                                     fill='lightblue')
+
+        # Draw the palaces
+        for x, y in [(3, 0), (3, 7)]:
+            self.canvas.create_line(self.cord(x), self.cord(y), self.cord(x + 2), self.cord(y + 2))
+            self.canvas.create_line(self.cord(x + 2), self.cord(y), self.cord(x), self.cord(y + 2))
+
+        # Draw the notation
+        self.x_notation = "abcdefghi"
+        self.y_notation = "0987654321"
+        for x in range(0, 9):
+            self.canvas.create_text(self.cord(x), self.cord(9.5), text=self.x_notation[x], font=('Arial', 20),
+                                    fill='black')
+        for y in range(0, 10):
+            self.canvas.create_text(self.cord(8.5), self.cord(y), text=self.y_notation[y], font=('Arial', 20),
+                                    fill='black')
+
+    def place_pieces(self):
+        """
+        Place the pieces of the current position on the canvas
+        """
+        for y in range(self.BOARD_HEIGHT):
+            for x in range(self.BOARD_WIDTH):
+                piece = self.position.piece_at(x, y)
+                if piece is None:
+                    continue
+                piece_type, color = piece
+                text = PIECES[piece_type][color]
+                self.canvas_items[(x, y)] = self.canvas.create_text(self.cord(x), self.cord(y), text=text,
+                                                                    font=('Arial', 35), fill=color)
+
+    def move_piece(self, action):
+        """
+        Make a valid action on the position and the canvas
+        :param action: A valid action of the side to move
+        """
+        x1, y1, x2, y2 = self.position.action_coords(action)
+
+        # Remove captured piece
+        if (x2, y2) in self.canvas_items:
+            self.canvas.delete(self.canvas_items.pop((x2, y2)))
+
+        # Move the piece on canvas
+        item_id = self.canvas_items.pop((x1, y1))
+        self.canvas.move(item_id, (x2 - x1) * self.SQUARE_SIZE, (y2 - y1) * self.SQUARE_SIZE)
+        self.canvas_items[(x2, y2)] = item_id
+
+        self.position.occupy(action)
+        self.moves_count += 1
+
+    def explain_invalid_move(self, piece_type, piece_color):
+        """
+        Explain why the movement from (x1, y1) to (x2, y2) is invalid
+        :param piece_type: The type of the moving piece
+        :param piece_color: The color of the moving piece
+        :return: The explanation for the invalid move
+        """
+        position = self.position
+        x1, y1, x2, y2 = self.x1, self.y1, self.x2, self.y2
+        dx, dy = x2 - x1, y2 - y1
+
+        # The movement does not fit the piece at all
+        if (dx * self.SQUARE_SIZE, dy * self.SQUARE_SIZE) not in PIECES[piece_type]['next']:
+            return self.MOVE_HINTS[piece_type]
+
+        red_king = position.king_position('red')
+        black_king = position.king_position('black')
+
+        # Current piece cannot move if it causes two Kings face each other directly
+        if not piece_type == 'King' and red_king[0] == black_king[0] == x1 and dx:
+            if position.count_between(x1, black_king[1], x1, red_king[1]) == 1:
+                return f"Your move for {piece_type} cause your King face the other King directly!"
+
+        # King and Advisor cannot go past its palace
+        if piece_type in ('King', 'Advisor'):
+            if not 3 <= x2 <= 5 or not (7 <= y2 <= 9 if piece_color == 'red' else 0 <= y2 <= 2):
+                return f"{piece_type} can not go past its 3x3 palace!"
+            if piece_type == 'King':
+                return f"{piece_type} can not face the King in other side directly!"
+
+        if piece_type == 'Elephant':
+            if position.piece_at((x1 + x2) // 2, (y1 + y2) // 2):
+                return f"{piece_type} can not move if there is a piece on the point in between!"
+            return f"{piece_type} can not go across the river!"
+
+        if piece_type == 'Chariot':
+            return f"{piece_type} is obstructed!"
+
+        if piece_type == 'Horse':
+            return f"{piece_type} can not move if there is a piece on the point in between!"
+
+        if piece_type == 'Cannon':
+            if position.count_between(x1, y1, x2, y2) == 0 and position.piece_at(x2, y2):
+                return f"{piece_type} needs one intermittent piece!"
+            return f"{piece_type} is obstructed!"
+
+        if piece_type == 'Pawn':
+            if dy > 0 and piece_color == 'red' or dy < 0 and piece_color == 'black':
+                return f"{piece_type} can only move forward!"
+            return f"{piece_type} can only move sideways after it goes across the river!"
+
+        return ""
+
+    def player_move_piece(self, event):
+        """
+        Player moves pieces by click the source and then click the target
+        :param event: The mouse click event
+        """
+        # Make sure the game is not over
+        if not self.is_game_over() == 0:
+            self.label3.config(text="Game is over! You can begin a new game!")
+            return
+
+        # Wait for AI to make its move
+        if self.search_id is not None:
+            self.label3.config(text="AI is thinking...")
+            return
+
+        # Choose the source piece
+        if not self.is_moving:
+            # Get the coordinate on the board
+            self.x1 = round(event.x / self.SQUARE_SIZE - 0.5)
+            self.y1 = round(event.y / self.SQUARE_SIZE - 0.5)
+
+            # Ensure that the player chooses a piece
+            piece = self.position.piece_at(self.x1, self.y1)
+            if piece:
+                piece_type, piece_color = piece
+
+                # Make sure player click the piece of the player's side
+                if piece_color == 'red' and self.ai_first.get():
+                    self.label3.config(text="Oops...AI is red side, you are black side!")
+                    self.label4.config(text="")
+                    return
+                elif piece_color == 'black' and not self.ai_first.get():
+                    self.label3.config(text="Oops...AI is black side, you are red side!")
+                    self.label4.config(text="")
+                    return
+
+                self.is_moving = True
+
+                # Show information below the canvas
+                self.label3.config(
+                    text=f"You have chosen the {piece_type} at {self.x_notation[self.x1]}{self.y_notation[self.y1]}.\n Please make a move...")
+                self.label4.config(text='', fg='red', font=('Arial', 15))
+
+        # Choose the target
+        else:
+            # Get the coordinate on the board
+            self.x2 = round(event.x / self.SQUARE_SIZE - 0.5)
+            self.y2 = round(event.y / self.SQUARE_SIZE - 0.5)
+
+            # Ensure piece in chess board
+            if self.x2 > 8 or self.y2 > 9:
+                return
+
+            # Get the type and color of the source piece
+            piece_type, piece_color = self.position.piece_at(self.x1, self.y1)
+
+            # Ensure piece can not move to position with piece with same color
+            target = self.position.piece_at(self.x2, self.y2)
+            if target and target[1] == piece_color:
+                return
+
+            action = self.position.find_action(self.x1, self.y1, self.x2, self.y2)
+
+            # Some warning if player makes invalid operation
+            if action is None:
+                self.label3.config(text=f"Oops...This is an invalid move!")
+                self.label4.config(text=self.explain_invalid_move(piece_type, piece_color))
+
+            # A move which leaves the own King attacked is not allowed
+            elif action not in self.position.legal_next_actions():
+                self.label3.config(text="Oops...This is an invalid move!")
+                self.label4.config(text="Your King would be in check after this move!")
+
+            else:
+                # Check for capture
+                if target:
+                    self.label3.config(text=f"You capture opponent’s {target[0]}!")
+
+                # Move the piece
+                self.move_piece(action)
+                self.check.config(state='disabled')
+
+                # AI make a move if game is not over
+                if self.is_game_over() == 0:
+                    self.ai_move_piece(action)
+                elif self.is_game_over() == 1:
+                    self.label4.config(text=f"You Win!!!", fg='green', font=('Arial', 20))
+                elif self.is_game_over() == 3:
+                    self.label4.config(text="Draw", fg='green', font=('Arial', 20))
+
+                if not target:
+                    self.label3.config(
+                        text=f"Valid move {self.x_notation[self.x1]}{self.y_notation[self.y1]}{self.x_notation[self.x2]}{self.y_notation[self.y2]}")
+
+            # Change the flag for next movement
+            self.is_moving = False
+
+    def ai_move_piece(self, player_action=None):
+        """
+        AI starts searching its move in the worker process, or takes over the search it started on the player's time
+        if the player has made the expected reply
+        :param player_action: The action the player has just made
+        """
+        if self.ponder_id is not None and player_action == self.ponder_action and \
+                self.ponder_limits == self.search_limits():
+            self.search_id = self.ponder_id
+        else:
+            if self.ponder_id is not None:
+                self.worker.stop()
+            self.search_id = self.worker.start(self.position.copy(), **self.search_limits())
+        self.ponder_id = None
+        self.ponder_action = None
+        self.root.after(50, self.poll_ai_move)
+
+    def start_pondering(self, principal_variation):
+        """
+        Search the position after the reply AI expects from the player, the result is used at once if the player
+        makes that reply, and the transposition table of the worker is warmed either way
+        :param principal_variation: The principal variation of the move AI has just made
+        """
+        if len(principal_variation) < 2 or not self.position.is_valid_action(principal_variation[1]):
+            return
+        position = self.position.copy()
+        position.occupy(principal_variation[1])
+        self.ponder_action = principal_variation[1]
+        self.ponder_limits = self.search_limits()
+        self.ponder_id = self.worker.start(position, **self.ponder_limits)
+
+    def search_limits(self):
+        """
+        Get the limits of the search from the widgets, a move time overrides the depth of the difficulty
+        :return: A dict of the keyword arguments depth_limit and time_limit of SearchWorker.start
+        """
+        if self.move_time.get() > 0:
+            return {'depth_limit': self.difficulty.get(), 'time_limit': self.move_time.get() * 1000}
+        return {'depth_limit': self.difficulty.get(), 'time_limit': None}
+
+    def poll_ai_move(self):
+        """
+        Check whether AI has found its move, and make the move if so
+        """
+        if self.search_id is None:
+            return
+
+        # Skip the results of cancelled searches
+        result = self.worker.poll()
+        while result is not None and result[0] != self.search_id:
+            result = self.worker.poll()
+        if result is None:
+            # The worker can only die at its start, e.g. on a broken book, so there is no result to wait for
+            if not self.worker.process.is_alive():
+                self.search_id = None
+                self.label4.config(text="AI has stopped, please restart the game", fg='red', font=('Arial', 15))
+                return
+            self.root.after(50, self.poll_ai_move)
+            return
+
+        self.search_id = None
+        action = result[1]
+        if action is None:
+            return
+
+        # AI make move
+        source_x, source_y, target_x, target_y = self.position.action_coords(action)
+        self.move_piece(action)
+        self.label4.config(
+            text=f"AI makes move {self.x_notation[source_x]}{self.y_notation[source_y]}{self.x_notation[target_x]}{self.y_notation[target_y]}",
+            fg='blue', font=('Arial', 20))
+
+        # Check whether game is over
+        if self.is_game_over() == 3:
+            self.label4.config(text="Draw", fg='green', font=('Arial', 20))
+        elif self.is_game_over() == 2:
+            self.label4.config(text="You Lose...", fg='green', font=('Arial', 20))
+        elif self.ponder.get():
+            self.start_pondering(result[5])
+
+    def is_game_over(self):
+        """
+        Check whether game is over
+        :return: An int value representing the state of game
+        """
+        winner = self.position.winner()
+        ai_color = 'red' if self.ai_first.get() else 'black'
+
+        # Player wins
+        if winner is not None and winner != ai_color:
+            res = 1
+        # AI wins
+        elif winner == ai_color:
+            res = 2
+        # Draw
+        elif self.moves_count == 50 or self.position.repetition_count() >= 2:
+            res = 3
+        # Game is not over
+        else:
+            res = 0
+        return res
+
+
+def position_after(moves, fen=INITIAL_FEN):
+    """
+    Play ICCS moves from a position
+    :param moves: The moves separated by spaces
+    :param fen: The position to start from
+    :return: The Position after the moves
+    """
+    position = Position()
+    position.load_fen(fen)
+    for move in moves.split():
+        action = position.action_from_iccs(move)
+        if action is None or action not in position.legal_next_actions():
+            raise ValueError(f"Invalid move {move}")
+        position.occupy(action)
+    return position
+
+
+def run_perft(depth=None, fen=INITIAL_FEN, moves='', divide=False, max_depth=3):
+    """
+    Count the leaf nodes of one position, or check the counts of all positions in PERFT_SUITE
+    :param depth: The depth to count, if not given the suite is checked
+    :param fen: The position to count
+    :param moves: ICCS moves played from the FEN position before counting
+    :param divide: Print the count below every action
+    :param max_depth: The deepest count of the suite to check
+    :return: True if all counts of the suite are right
+    """
+    if depth is not None:
+        position = position_after(moves, fen)
+        start = time.perf_counter()
+        if divide:
+            result = position.divide(depth)
+            for move, nodes in result:
+                print(f"{move} {nodes}")
+            nodes = sum(nodes for _, nodes in result)
+        else:
+            nodes = position.perft(depth)
+        elapsed = time.perf_counter() - start
+        print(f"depth {depth} nodes {nodes} time {elapsed:.2f}s nps {nodes / max(elapsed, 1e-9):.0f}")
+        return True
+
+    passed = True
+    for fen, counts in PERFT_SUITE:
+        position = Position()
+        position.load_fen(fen)
+        for depth, expected in sorted(counts.items()):
+            if depth > max_depth:
+                continue
+            start = time.perf_counter()
+            nodes = position.perft(depth)
+            elapsed = time.perf_counter() - start
+            status = 'ok' if nodes == expected else f'FAILED, expected {expected}'
+            passed = passed and nodes == expected
+            print(f"[{fen}] depth {depth} nodes {nodes} time {elapsed:.2f}s "
+                  f"nps {nodes / max(elapsed, 1e-9):.0f} {status}")
+    return passed
+
+
+def run_mate_suite(depth=9):
+    """
+    Check that the engine plays the shortest forced win of every position in MATE_SUITE
+    :param depth: The depth limit of the search, which is deeper than every win of the suite
+    :return: True if every win found is the shortest one
+    """
+    passed = True
+    for fen, plies in MATE_SUITE:
+        engine = Engine(position_after('', fen), depth_limit=depth)
+        start = time.perf_counter()
+        action = engine.start_evaluation()
+        elapsed = time.perf_counter() - start
+        found = MATE_SCORE - engine.best_value if engine.best_value is not None else None
+        status = 'ok' if found == plies else f'FAILED, expected {plies}'
+        passed = passed and found == plies
+        print(f"[{fen}] move {engine.position.action_to_iccs(action)} mate in {found} plies "
+              f"depth {engine.completed_depth} time {elapsed:.2f}s {status}")
+    return passed
+
+
+def _iteration_report(iterations):
+    """
+    Summarize the iterations of one or more searches
+    :param iterations: Tuples (depth, nodes, seconds) where nodes and seconds count from the start of the search
+    :return: A dict of the nodes and the seconds to reach every depth and the effective branching factor
+    """
+    nodes = {}
+    seconds = {}
+    for depth, total_nodes, total_seconds in iterations:
+        nodes[depth] = nodes.get(depth, 0) + total_nodes
+        seconds[depth] = seconds.get(depth, 0) + total_seconds
+    depths = sorted(nodes)
+
+    # The nodes of one iteration grow by this factor with every ply
+    branching_factor = None
+    if len(depths) > 1:
+        first = nodes[depths[0]]
+        last = nodes[depths[-1]] - nodes[depths[-2]]
+        branching_factor = round((last / first) ** (1 / (depths[-1] - depths[0])), 2)
+
+    return {
+        'nodes_to_depth': {str(depth): nodes[depth] for depth in depths},
+        'time_to_depth': {str(depth): round(seconds[depth], 4) for depth in depths},
+        'branching_factor': branching_factor,
+    }
+
+
+def _bench_rates(counters):
+    """
+    :param counters: The nodes, time, table_probes, table_hits, cutoffs and first_cutoffs of a search
+    :return: A dict of the counts and the rates computed from them
+    """
+    return {
+        'nodes': counters['nodes'],
+        'time': round(counters['time'], 4),
+        'nps': round(counters['nodes'] / max(counters['time'], 1e-9)),
+        'table_hit_rate': round(counters['table_hits'] / max(counters['table_probes'], 1), 4),
+        'cutoffs': counters['cutoffs'],
+        'cutoff_ratio': round(counters['first_cutoffs'] / max(counters['cutoffs'], 1), 4),
+    }
+
+
+def run_bench(depth=4, fen=None, moves=''):
+    """
+    Search the positions of PERFT_SUITE with a fresh table and report the speed and the efficiency of the search
+    The cutoff ratio is the share of cutoffs made by the first action searched, which tells how good the ordering is
+    :param depth: The depth to search every position to
+    :param fen: The only position to search if given
+    :param moves: ICCS moves played from the FEN position or the initial position before searching
+    :return: A dict which can be written as JSON
+    """
+    if fen is None and not moves:
+        positions = [position_after('', fen) for fen, _ in PERFT_SUITE]
+    else:
+        positions = [position_after(moves, fen or INITIAL_FEN)]
+    reports = []
+    iterations = []
+    totals = {'nodes': 0, 'time': 0, 'table_probes': 0, 'table_hits': 0, 'cutoffs': 0, 'first_cutoffs': 0}
+    for position in positions:
+        engine = Engine(position, depth_limit=depth)
+        fen = position.to_fen()
+        start = time.perf_counter()
+        action = engine.start_evaluation()
+        elapsed = time.perf_counter() - start
+        value = engine.best_value
+
+        counters = {
+            'nodes': engine.nodes,
+            'time': elapsed,
+            'table_probes': engine.table_probes,
+            'table_hits': engine.table_hits,
+            'cutoffs': engine.cutoffs,
+            'first_cutoffs': engine.first_cutoffs,
+        }
+        for name, count in counters.items():
+            totals[name] += count
+        iterations.extend(engine.iterations)
+
+        report = {
+            'fen': fen,
+            'best_move': engine.position.action_to_iccs(action) if action is not None else None,
+            'score': value,
+            'depth': engine.completed_depth,
+        }
+        report.update(_bench_rates(counters))
+        report.update(_iteration_report(engine.iterations))
+        reports.append(report)
+
+    total = _bench_rates(totals)
+    total.update(_iteration_report(iterations))
+    return {'depth': depth, 'positions': reports, 'total': total}
+
+
+def random_opening(plies, seed):
+    """
+    Play random legal moves from the initial position
+    :param plies: The number of moves to play
+    :param seed: The seed of the random moves, the same seed gives the same opening
+    :return: The ICCS moves separated by spaces
+    """
+    rng = random.Random(seed)
+    position = position_after('')
+    moves = []
+    for _ in range(plies):
+        actions = position.legal_next_actions()
+        if not actions:
+            break
+        action = rng.choice(sorted(actions))
+        moves.append(position.action_to_iccs(action))
+        position.occupy(action)
+    return ' '.join(moves)
+
+
+def play_game(red_options, black_options, opening='', max_plies=200):
+    """
+    Play a game between two engines without any display
+    A side wins by capturing the King, when the other side has no legal move or repeats by perpetual check or chase,
+    the game is drawn at max_plies or when a position occurs for the third time
+    :param red_options: The keyword arguments of the Engine of the red side, e.g. {'depth_limit': 3}
+    :param black_options: The keyword arguments of the Engine of the black side
+    :param opening: ICCS moves played before the engines take over
+    :param max_plies: The number of moves after which the game is drawn
+    :return: A tuple (winner, plies), the winner is 'red', 'black' or None for a draw
+    """
+    position = position_after(opening)
+    engines = {
+        RED: Engine(position.copy(), **red_options),
+        BLACK: Engine(position.copy(), **black_options),
+    }
+    plies = len(opening.split())
+    while plies < max_plies:
+        winner = position.winner()
+        if winner is not None:
+            return winner, plies
+        if position.repetition_count() >= 2:
+            return None, plies
+
+        engine = engines[position.side]
+        engine.position = position.copy()
+        action = engine.start_evaluation()
+        position.occupy(action)
+        plies += 1
+    return position.winner(), plies
+
+
+def _play_match_game(first_options, second_options, first_is_red, opening, max_plies):
+    """
+    Play a game of a match in a pool process
+    :return: The score of the first engine, 1 for a win, 0.5 for a draw and 0 for a loss
+    """
+    if first_is_red:
+        winner, _ = play_game(first_options, second_options, opening, max_plies)
+    else:
+        winner, _ = play_game(second_options, first_options, opening, max_plies)
+    if winner is None:
+        return 0.5
+    return 1 if (winner == 'red') == first_is_red else 0
+
+
+def match_statistics(wins, draws, losses, elo0=0, elo1=5, alpha=0.05, beta=0.05):
+    """
+    Estimate the Elo difference of a match and run the sequential probability ratio test of elo0 against elo1
+    :param wins: The wins of the first engine
+    :param draws: The draws
+    :param losses: The losses of the first engine
+    :param elo0: The Elo difference of the null hypothesis
+    :param elo1: The Elo difference of the alternative hypothesis
+    :param alpha: The probability of accepting elo1 when elo0 holds
+    :param beta: The probability of accepting elo0 when elo1 holds
+    :return: A dict of the score, the Elo difference with its 95% error margin and the result of the test
+    """
+    games = wins + draws + losses
+    if games == 0:
+        return {'score': None, 'elo': None, 'elo_error': None, 'llr': 0.0, 'sprt': 'continue'}
+
+    def elo(score):
+        score = min(max(score, 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / score - 1)
+
+    def expected_score(elo_difference):
+        return 1 / (1 + 10 ** (-elo_difference / 400))
+
+    # The mean and the variance of the score of one game
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    # The log-likelihood ratio of the normal approximation of the trinomial distribution
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    llr = games * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance) if variance > 0 else 0.0
+    lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+    if llr >= upper:
+        sprt = f'H1 accepted, elo >= {elo1}'
+    elif llr <= lower:
+        sprt = f'H0 accepted, elo <= {elo0}'
+    else:
+        sprt = 'continue'
+
+    return {
+        'score': round(score, 4),
+        'elo': round(elo(score), 1),
+        'elo_error': round((elo(score + margin) - elo(score - margin)) / 2, 1),
+        'llr': round(llr, 3),
+        'llr_bounds': [round(lower, 3), round(upper, 3)],
+        'sprt': sprt,
+    }
+
+
+def run_match(first_options, second_options, games=100, opening_plies=4, max_plies=200, workers=None, seed=0,
+              elo0=0, elo1=5, progress=None):
+    """
+    Play a match between two engine configurations across a pool of processes
+    Every random opening is played twice with the colors swapped, so that an unbalanced opening favors no engine
+    :param first_options: The keyword arguments of the first Engine, e.g. {'depth_limit': 3}
+    :param second_options: The keyword arguments of the second Engine
+    :param games: The number of games, rounded up to an even number
+    :param opening_plies: The number of random moves of every opening
+    :param max_plies: The number of moves after which a game is drawn
+    :param workers: The number of processes, which is the number of CPUs if not given
+    :param seed: The seed of the openings
+    :param elo0: The Elo difference of the null hypothesis of the SPRT
+    :param elo1: The Elo difference of the alternative hypothesis of the SPRT
+    :param progress: A function called with the wins, draws and losses after every game
+    :return: A dict which can be written as JSON
+    """
+    results = {1: 0, 0.5: 0, 0: 0}
+    start = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=context) as executor:
+        futures = []
+        for pair in range((games + 1) // 2):
+            opening = random_opening(opening_plies, seed * 1000003 + pair)
+            for first_is_red in (True, False):
+                futures.append(executor.submit(_play_match_game, first_options, second_options, first_is_red,
+                                               opening, max_plies))
+        for future in as_completed(futures):
+            results[future.result()] += 1
+            if progress is not None:
+                progress(results[1], results[0.5], results[0])
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'first': first_options,
+        'second': second_options,
+        'games': len(futures),
+        'wins': results[1],
+        'draws': results[0.5],
+        'losses': results[0],
+        'time': round(elapsed, 2),
+        'games_per_hour': round(len(futures) / max(elapsed, 1e-9) * 3600),
+    }
+    report.update(match_statistics(results[1], results[0.5], results[0], elo0, elo1))
+    return report
+
+
+def read_game_records(text):
+    """
+    Read the games of a corpus, either PGN with ICCS moves such as 'H2-E2' or one game of ICCS moves per line
+    :param text: The content of the corpus
+    :return: A list of games, every game is a list of ICCS moves such as 'h2e2'
+    """
+    # Comments and variations are not part of the games
+    text = re.sub(r'\{[^}]*\}|\([^)]*\)|;[^\n]*', ' ', text)
+    pgn = re.search(r'^\s*\[', text, re.MULTILINE) is not None
+
+    games = []
+    moves = []
+    for line in text.splitlines():
+        if line.lstrip().startswith('['):
+            if moves:
+                games.append(moves)
+                moves = []
+            continue
+        for token in line.split():
+            if token in ('1-0', '0-1', '1/2-1/2', '*'):
+                if moves:
+                    games.append(moves)
+                    moves = []
+            match = re.fullmatch(r'(?:\d+\.+)?([a-i][0-9])-?([a-i][0-9])', token.lower())
+            if match:
+                moves.append(match.group(1) + match.group(2))
+        if not pgn and moves:
+            games.append(moves)
+            moves = []
+    if moves:
+        games.append(moves)
+    return games
+
+
+def build_opening_book(corpus_paths, book_path, max_plies=20, min_count=1):
+    """
+    Build an opening book from the games of a corpus, every action is weighted by the number of games it was played in
+    A game is read until its first invalid move
+    :param corpus_paths: The files of the corpus, see read_game_records
+    :param book_path: The file to write the book to
+    :param max_plies: The number of moves of every game to put in the book
+    :param min_count: The number of games an action has to be played in to be put in the book
+    :return: The number of records written
+    """
+    counts = {}
+    for corpus_path in corpus_paths:
+        with open(corpus_path, encoding='utf-8', errors='replace') as f:
+            games = read_game_records(f.read())
+        for moves in games:
+            position = position_after('')
+            for move in moves[:max_plies]:
+                action = position.action_from_iccs(move)
+                if action is None or action not in position.legal_next_actions():
+                    break
+                counts[position.key, action] = counts.get((position.key, action), 0) + 1
+                position.occupy(action)
+
+    records = sorted((key, (action & 127) * BOARD_WIDTH * BOARD_HEIGHT + (action >> 7 & 127), min(count, 0xFFFF))
+                     for (key, action), count in counts.items() if count >= min_count)
+    with open(book_path, 'wb') as f:
+        f.write(BOOK_HEADER.pack(BOOK_MAGIC, position_after('').key))
+        for record in records:
+            f.write(BOOK_RECORD.pack(*record))
+    return len(records)
+
+
+def _solve_tablebase(material, tablebase):
+    """
+    Solve every placement of a material by retrograde analysis
+    A position without a legal action is lost, a position is won in n + 1 plies if an action leads to a position
+    lost in n plies, and lost in n + 1 plies if all actions lead to positions won in at most n plies. The results are
+    spread back from the ends of the game in the order of their distance, captures are looked up in the tablebase
+    :param material: The _TablebaseMaterial to solve
+    :param tablebase: The Tablebase holding every ending reached by a capture
+    :return: A bytearray of the values of all placements, see Tablebase
+    """
+    size = material.size
+    other = RED | BLACK
+    king_slots = {piece & other: slot for slot, piece in enumerate(material.pieces) if piece & 7 == KING}
+
+    # The number of actions whose result is not known yet, and the longest win of the other side among the known ones
+    remaining = array('H', [0]) * size
+    longest = bytearray(size)
+
+    # The positions whose result may be known at every distance, and the quiet actions between positions
+    buckets = [[] for _ in range(256)]
+    children = array('i')
+    parents = array('i')
+
+    position = Position()
+    for counter, squares in enumerate(itertools.product(*material.squares)):
+        if len(set(squares)) < len(squares) or \
+                any(same and squares[slot] < squares[slot - 1] for slot, same in enumerate(material.same_as_previous)):
+            continue
+        position.board = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+        for piece, sq in zip(material.pieces, squares):
+            position.board[sq] = piece
+        position.kings = {color: squares[slot] for color, slot in king_slots.items()}
+
+        for side in (RED, BLACK):
+            index = counter * 2 + (side == BLACK)
+            position.side = side
+            if position.in_check(side ^ other):
+                continue
+            actions = position.legal_next_actions()
+            if not actions:
+                buckets[0].append(index)
+                continue
+
+            for action in actions:
+                source, target = action & 127, action >> 7 & 127
+                if action >> 14:
+                    occupy_info = position.occupy(action)
+                    result, distance = tablebase.probe(position)
+                    position.restore(occupy_info)
+                    if result < 0:
+                        buckets[distance + 1].append(index)
+                    if result <= 0:
+                        remaining[index] += 1
+                    else:
+                        longest[index] = max(longest[index], distance)
+                    continue
+
+                # Keep identical pieces in the order of their squares
+                child = list(squares)
+                slot = child.index(source)
+                child[slot] = target
+                while slot > 0 and material.same_as_previous[slot] and child[slot] < child[slot - 1]:
+                    child[slot], child[slot - 1] = child[slot - 1], child[slot]
+                    slot -= 1
+                while slot + 1 < len(child) and material.same_as_previous[slot + 1] and child[slot] > child[slot + 1]:
+                    child[slot], child[slot + 1] = child[slot + 1], child[slot]
+                    slot += 1
+                children.append(material.index(child, side ^ other))
+                parents.append(index)
+                remaining[index] += 1
+
+            if not remaining[index]:
+                buckets[longest[index] + 1].append(index)
+
+    # The parents of every position, grouped by the position
+    offsets = array('i', [0]) * (size + 1)
+    for child in children:
+        offsets[child + 1] += 1
+    for index in range(size):
+        offsets[index + 1] += offsets[index]
+    ends = array('i', offsets)
+    predecessors = array('i', [0]) * len(children)
+    for child, parent in zip(children, parents):
+        predecessors[ends[child]] = parent
+        ends[child] += 1
+
+    values = bytearray(size)
+    for distance in range(255):
+        for index in buckets[distance]:
+            if values[index]:
+                continue
+            values[index] = distance + 1
+            for parent in predecessors[offsets[index]:offsets[index + 1]]:
+                if values[parent]:
+                    continue
+                if distance % 2 == 0:
+                    buckets[distance + 1].append(parent)
+                else:
+                    longest[parent] = max(longest[parent], distance)
+                    remaining[parent] -= 1
+                    if not remaining[parent]:
+                        buckets[longest[parent] + 1].append(parent)
+    if any(not values[index] for index in buckets[255]):
+        raise ValueError(f"The ending {material.signature} lasts longer than the tablebase can hold")
+    return values
+
+
+def generate_tablebase(signature, directory, progress=None):
+    """
+    Solve an ending and write its file, the endings reached by a capture are solved first
+    Endings already in the directory, also with the colors swapped, are not solved again
+    :param signature: The material of the ending, e.g. 'KR-KAA', see _material_signature
+    :param directory: The directory of the files, which is created if needed
+    :param progress: A function called with the signature of every file written
+    :return: The Tablebase of the directory
+    """
+    material = _TablebaseMaterial(signature)
+    os.makedirs(directory, exist_ok=True)
+    tablebase = Tablebase(directory)
+    if tablebase.contains(material.signature):
+        return tablebase
+
+    for slot, piece in enumerate(material.pieces):
+        if piece & 7 != KING:
+            tablebase = generate_tablebase(_material_signature(material.pieces[:slot] + material.pieces[slot + 1:]),
+                                           directory, progress)
+
+    values = _solve_tablebase(material, tablebase)
+    with open(os.path.join(directory, material.signature + '.tb'), 'wb') as f:
+        f.write(TABLEBASE_MAGIC)
+        f.write(values)
+    tablebase.load(material.signature)
+    if progress is not None:
+        progress(material.signature)
+    return tablebase
+
+
+def _fen_argument(text):
+    """
+    Check a FEN string given on the command line
+    :param text: The FEN string
+    :return: The same string if it describes a valid position
+    """
+    try:
+        Position().load_fen(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return text
+
+
+def _depth_argument(text):
+    """
+    Check a depth given on the command line
+    :param text: The depth
+    :return: The depth as an int if it is not negative
+    """
+    try:
+        depth = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid depth {text!r}")
+    if depth < 0:
+        raise argparse.ArgumentTypeError(f"the depth {depth} is negative")
+    return depth
+
+
+def _engine_options(text):
+    """
+    Read the keyword arguments of an Engine from the command line
+    :param text: e.g. 'depth_limit=3,time_limit=100' or 'depth_limit=4,null_move=0'
+    :return: A dict of the keyword arguments
+    """
+    options = {}
+    for item in filter(None, text.split(',')):
+        name, _, value = item.partition('=')
+        if name not in ('depth_limit', 'time_limit', 'null_move', 'late_move_reductions', 'principal_variation_search',
+                        'aspiration_windows') or not value.isdigit():
+            raise argparse.ArgumentTypeError(f"invalid engine option {item!r}")
+        options[name] = int(value)
+    return options
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chinese chess with AI opponent, the GUI starts without a command")
+    parser.add_argument('--book', help="the opening book AI plays from in the GUI and with ucci")
+    parser.add_argument('--tablebase', help="the tablebase directory AI plays from in the GUI and with ucci")
+    subparsers = parser.add_subparsers(dest='command')
+    perft_parser = subparsers.add_parser('perft', help="count the leaf nodes of the move tree")
+    perft_parser.add_argument('depth', type=_depth_argument, nargs='?',
+                              help="the depth to count, the suite is checked if not given")
+    perft_parser.add_argument('--fen', type=_fen_argument, default=INITIAL_FEN,
+                              help="the position to count, the initial one by default")
+    perft_parser.add_argument('--moves', default='', help="ICCS moves played before counting, e.g. 'h2e2 h9g7'")
+    perft_parser.add_argument('--divide', action='store_true', help="print the count below every move")
+    perft_parser.add_argument('--max-depth', type=int, default=3, help="the deepest count of the suite to check")
+    mate_parser = subparsers.add_parser('mate', help="check that the engine plays the shortest wins of a fixed suite")
+    mate_parser.add_argument('depth', type=int, nargs='?', default=9, help="the depth limit of every search")
+    bench_parser = subparsers.add_parser('bench', help="measure the search on a fixed set of positions")
+    bench_parser.add_argument('depth', type=int, nargs='?', default=4, help="the depth to search every position to")
+    bench_parser.add_argument('--fen', type=_fen_argument, help="the only position to search")
+    bench_parser.add_argument('--moves', default='', help="ICCS moves played before searching the only position")
+    bench_parser.add_argument('--output', help="write the JSON report to this file instead of printing it")
+    subparsers.add_parser('ucci', help="talk to a Xiangqi GUI with the UCCI protocol on stdin and stdout")
+    match_parser = subparsers.add_parser('match', help="play games between two engine configurations")
+    match_parser.add_argument('--first', type=_engine_options, default={'depth_limit': 3},
+                              help="the options of the first engine, e.g. 'depth_limit=3' or 'time_limit=100'")
+    match_parser.add_argument('--second', type=_engine_options, default={'depth_limit': 2},
+                              help="the options of the second engine")
+    match_parser.add_argument('--movetime', type=int, help="milliseconds per move of both engines")
+    match_parser.add_argument('--games', type=int, default=100, help="the number of games")
+    match_parser.add_argument('--opening-plies', type=int, default=4, help="the number of random opening moves")
+    match_parser.add_argument('--max-plies', type=int, default=200, help="the number of moves before a draw")
+    match_parser.add_argument('--workers', type=int, help="the number of processes, the number of CPUs by default")
+    match_parser.add_argument('--seed', type=int, default=0, help="the seed of the random openings")
+    match_parser.add_argument('--elo0', type=float, default=0, help="the Elo difference of the SPRT null hypothesis")
+    match_parser.add_argument('--elo1', type=float, default=5, help="the Elo difference of the SPRT alternative")
+    book_parser = subparsers.add_parser('book', help="build an opening book from game records")
+    book_parser.add_argument('corpus', nargs='+', help="PGN files with ICCS moves or files of one game per line")
+    book_parser.add_argument('--output', default='book.bin', help="the file to write the book to")
+    book_parser.add_argument('--max-plies', type=int, default=20, help="the number of moves of every game to use")
+    book_parser.add_argument('--min-count', type=int, default=1, help="the number of games a move needs")
+    tablebase_parser = subparsers.add_parser('tablebase', help="solve endings with few pieces")
+    tablebase_parser.add_argument('material', nargs='+',
+                                  help="the pieces of every ending, red then black, e.g. KR-KAA or KNP-K")
+    tablebase_parser.add_argument('--directory', default='tablebase', help="the directory to write the files to")
+    args = parser.parse_args()
+
+    # The book and the tablebase are opened here as well as in the worker process of the GUI, so that bad ones are
+    # reported at once
+    book = tablebase = None
+    if args.book and args.command in ('ucci', None):
+        try:
+            book = OpeningBook(args.book)
+        except (OSError, ValueError) as e:
+            parser.error(f"argument --book: {e}")
+    if args.tablebase and args.command in ('ucci', None):
+        try:
+            tablebase = Tablebase(args.tablebase)
+        except (OSError, ValueError) as e:
+            parser.error(f"argument --tablebase: {e}")
+
+    if args.command == 'perft':
+        if args.divide and args.depth == 0:
+            perft_parser.error("argument --divide: the depth must be at least 1")
+        sys.exit(0 if run_perft(args.depth, args.fen, args.moves, args.divide, args.max_depth) else 1)
+    if args.command == 'mate':
+        sys.exit(0 if run_mate_suite(args.depth) else 1)
+    if args.command == 'ucci':
+        UcciFrontend(book=book, tablebase=tablebase).run()
+        return
+    if args.command == 'tablebase':
+        for material in args.material:
+            try:
+                generate_tablebase(material, args.directory, lambda signature: print(f"{signature} solved"))
+            except ValueError as e:
+                parser.error(str(e))
+        return
+    if args.command == 'book':
+        records = build_opening_book(args.corpus, args.output, args.max_plies, args.min_count)
+        print(f"{records} moves written to {args.output}")
+        return
+    if args.command == 'match':
+        if args.movetime is not None:
+            args.first = dict(args.first, time_limit=args.movetime)
+            args.second = dict(args.second, time_limit=args.movetime)
+
+        def progress(wins, draws, losses):
+            print(f"games {wins + draws + losses} wins {wins} draws {draws} losses {losses}", file=sys.stderr)
+
+        report = run_match(args.first, args.second, args.games, args.opening_plies, args.max_plies, args.workers,
+                           args.seed, args.elo0, args.elo1, progress)
+        print(json.dumps(report, indent=2))
+        return
+    if args.command == 'bench':
+        report = json.dumps(run_bench(args.depth, args.fen, args.moves), indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(report + '\n')
+        else:
+            print(report)
+        return
+
+    # Create the main window
+    import tkinter as tk
+    root = tk.Tk()
+    root.title("Chinese Chess")
+    root.geometry('800x800')
+    root.resizable(False, False)
+    my_game = ChineseChessGUI(root, args.book, args.tablebase)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()